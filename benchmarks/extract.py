@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+'''Card extraction benchmark
+
+Extracts the activities of synthetic dashboard pages (see feed.py) with the
+single pass CardExtractor over the lxml tree and with the BeautifulSoup
+path it replaced (about ten CSS selects per card, three walks of the
+stats and the cards selected again for the feed cursor), and prints cards
+per second of each, parsing included and excluded. Both paths use the
+stat converters of stats.py, only the extraction differs.
+
+    python benchmarks/extract.py [--cards 3000] [--page-size 30] [--repeat 3]
+
+The BeautifulSoup path needs beautifulsoup4, it is skipped without it.'''
+
+import argparse, re, sys, time
+
+from datetime import datetime
+from feed import Feed
+from stravatools.scraper import CARD_EXTRACTOR
+from stravatools._intern.document import Document
+from stravatools._intern.stats import to_distance, to_duration, to_elevation, to_sport
+from stravatools._intern.units import UNIT_EMPTY
+
+def first(tags, mapper=lambda tag: tag):
+    if len(tags) > 0: return mapper(tags[0])
+
+def tag_string(tag):
+    return tag.string.replace('\n', '')
+
+def find_stat(card, pattern, formatter):
+    for stat in card.select('div.media-body ul.list-stats .stat'):
+        m = re.search(pattern, stat.text)
+        if m: return formatter(m.group(1))
+    return UNIT_EMPTY
+
+def soup_activities(soup):
+    '''Records and feed cursor the way StravaScraper.activities read them
+    before CardExtractor'''
+    records = []
+    for card in soup.select('div.activity'):
+        records.append({
+            'athlete_id': first(card.select('a.entry-owner'), lambda tag: tag.get('href').split('/')[-1]),
+            'athlete_name': first(card.select('a.entry-owner'), tag_string),
+            'kind': first(card.select('.entry-body .media .app-icon'), lambda tag: to_sport(tag.get('class'))),
+            'time': first(card.select('time time'), tag_string),
+            'datetime': first(card.select('time time'), lambda tag: datetime.strptime(tag.get('datetime'), '%Y-%m-%d %H:%M:%S %Z')),
+            'title': first(card.select('h3 a'), tag_string),
+            'id': first(card.select('h3 a'), lambda tag: tag.get('href').split('/')[-1]),
+            'distance': find_stat(card, r'\s*Distance\s*(.+)\s', to_distance),
+            'duration': find_stat(card, r'\s*Time\s*(.+)\s', to_duration),
+            'elevation': find_stat(card, r'\s*Elevation Gain\s*(.+)\s', to_elevation),
+            'kudoed': first(card.select('div.entry-footer div.media-actions button.js-add-kudo')) is None,
+        })
+    cards = soup.select('div.activity.feed-entry.card')
+    datetimes = [ tag.get('datetime').replace(' UTC', '') for tag in soup.select('div.activity.feed-entry.card time time') ]
+    entries = list(zip([ card.get('data-rank') for card in cards ], [ card.get('data-updated-at') for card in cards ], datetimes))
+    cursor = (min(entries)[0], min(entries, key=lambda entry: entry[2])[1]) if entries else None
+    return (records, cursor)
+
+def soup_path(texts):
+    from bs4 import BeautifulSoup
+    soups = []
+    start = time.perf_counter()
+    for text in texts:
+        soups.append(BeautifulSoup(text, 'lxml'))
+    parsed = time.perf_counter()
+    cards = sum(len(soup_activities(soup)[0]) for soup in soups)
+    return (cards, parsed - start, time.perf_counter() - parsed)
+
+def compiled_path(texts):
+    documents = []
+    start = time.perf_counter()
+    for text in texts:
+        document = Document(text)
+        document.tree
+        documents.append(document)
+    parsed = time.perf_counter()
+    cards = 0
+    for document in documents:
+        cards += len(document.records(CARD_EXTRACTOR))
+        document.feed_cursor()
+    return (cards, parsed - start, time.perf_counter() - parsed)
+
+PATHS = (('soup', soup_path), ('compiled', compiled_path))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cards', type=int, default=3000, help='Number of cards (default 3000)')
+    parser.add_argument('--page-size', type=int, default=30, help='Cards per page (default 30)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per path, the best one is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    texts = list(Feed(options.cards, options.seed).pages(options.cards, options.page_size))
+    print('%d cards in %d pages' % (options.cards, len(texts)))
+    print('  %-9s %8s %12s %12s' % ('Path', 'Cards', 'cards/s', 'extract only'))
+    for (name, path) in PATHS:
+        try:
+            runs = [ path(texts) for _ in range(options.repeat) ]
+        except ImportError as e:
+            print('  %-9s skipped: %s' % (name, e))
+            continue
+        cards = runs[0][0]
+        total = min(parse + extract for (count, parse, extract) in runs)
+        extract = min(extract for (count, parse, extract) in runs)
+        print('  %-9s %8d %12.0f %12.0f' % (name, cards, cards / total, cards / extract))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python
+'''Synthetic dashboard feed
+
+Generates dashboard pages shaped like the ones StravaScraper.activities()
+reads: activity cards of a few hundred athletes (some posting much more
+than others) going back in time, with the usual mix of sports, missing
+stats, thousand separators, imperial units, accented titles, kudo buttons,
+comments and the page chrome around the feed. The same seed always gives
+the same feed.
+
+    python benchmarks/feed.py 1000 [--page-size 30] [--seed 0] [-o DIRECTORY]
+
+writes the pages to DIRECTORY (page-00001.html...), ready for the sample
+command, or a single page to stdout.'''
+
+import argparse, bisect, datetime, html, itertools, os, random, sys
+
+PAGE = '''<!DOCTYPE html>
+<html class="logged-in" lang="en">
+<head><meta charset="utf-8"><title>Dashboard | Strava</title>
+<meta name="csrf-param" content="authenticity_token">
+<meta name="csrf-token" content="{token}">
+<link rel="stylesheet" href="/assets/strava-app-icons.css"><link rel="stylesheet" href="/assets/dashboard.css"></head>
+<body><header><nav class="global-nav"><ul>{nav}</ul><a href="/logout">Log Out</a></nav></header>
+<div class="page container"><div class="row">
+<div class="spans5 sidebar"><div class="athlete-profile"><a href="/athletes/{owner_id}"><div class="avatar"></div></a>
+<div class="athlete-name">{owner}</div><ul class="stats">{sidebar}</ul></div></div>
+<div class="spans11 feed-container"><div class="feed">
+{cards}
+</div><div class="feed-more"><a class="load-feed" href="#">Load more</a></div></div>
+</div></div><footer><ul>{nav}</ul></footer></body></html>
+'''
+
+CARD = '''<div class="activity feed-entry card" data-rank="{rank}" data-updated-at="{updated}" id="Activity-{id}">
+<div class="entry-head"><div class="avatar avatar-athlete"><a href="/athletes/{athlete_id}"><img src="/avatars/{athlete_id}.jpg" alt="{name}"></a></div>
+<div class="entry-athlete"><a class="entry-owner" href="/athletes/{athlete_id}">{name}</a>{badge}</div>
+<time class="timestamp text-small"><time datetime="{datetime}">{when}</time></time>{location}</div>
+<div class="entry-body"><div class="media"><div class="media-left"><span class="app-icon icon-{icon} icon-lg"></span></div>
+<div class="media-body"><h3 class="entry-title activity-title"><strong><a href="/activities/{id}">{title}</a></strong></h3>{description}
+<ul class="list-stats">{stats}</ul></div></div>{photos}</div>
+<div class="entry-footer"><div class="media-actions"><div class="kudos-count">{kudos}</div>{kudo}<button class="btn btn-icon js-comment">Comment</button></div>{comments}</div></div>
+'''
+
+STAT = '''<li><div class="stat"><span class="stat-subtext">{label}</span>
+<b class="stat-text">{value}</b>
+</div></li>'''
+
+KUDO_BUTTON = '<button class="btn btn-icon js-add-kudo" title="Give kudos">Kudo</button>'
+KUDOED_BUTTON = '<button class="btn btn-icon" disabled title="View all kudos">Kudoed</button>'
+COMMENT = '<li class="comment"><a href="/athletes/{id}">{name}</a><p>{text}</p></li>'
+NAV = ''.join('<li><a href="/%s">%s</a></li>' % (path, path.capitalize())
+    for path in ('dashboard', 'training', 'explore', 'challenges', 'clubs', 'segments', 'routes', 'settings'))
+SIDEBAR = ''.join('<li><span class="label">%s</span><b>%d</b></li>' % (label, value)
+    for (label, value) in (('Following', 182), ('Followers', 203), ('Activities', 1534)))
+
+FIRST_NAMES = ('Jean', 'Léa', 'Zoé', 'Nicolas', 'Mathilde', 'Luca', 'Sofía', 'Ingrid', 'Björn', 'Anaïs', 'Pierre',
+    'Martina', 'José', 'Chloé', 'Håkon', 'Émilie', 'Lars', 'Noémie', 'Tomás', 'Aurélien', 'Sam', 'Kenji', 'Ana', 'Ewa')
+LAST_NAMES = ('Dupont', 'Müller', 'Rossi', 'García', 'Nilsson', 'Lefèvre', 'Bianchi', 'Øvergård', 'Martin', 'Novák',
+    'Fernández', 'Girard', 'Jansen', 'Kowalski', 'Bernard', 'Lindqvist', 'Moreau', 'Schäfer', 'Sato', 'Costa')
+PLACES = ('Lausanne', 'Norefjell', 'Genève', 'Annecy', 'Chamonix', 'Zürich', 'Montréal', 'Bodø', 'Sète', 'Lyon',
+    'Mont Ventoux', 'Col du Galibier', 'Watopia', 'Lac Léman', 'Vallée de Joux', 'Jura', 'Salève', 'Grand Bornand')
+PARTS_OF_DAY = (('Morning', 'matinale', 5), ('Lunch', 'du midi', 11), ('Afternoon', "dans l'après-midi", 14),
+    ('Evening', 'du soir', 18), ('Night', 'de nuit', 22))
+
+# icon class, English name, French name, share of the feed, km/h, with distance, with elevation
+SPORTS = (
+    ('run', 'Run', 'Course à pied', 40, 11.0, True, True),
+    ('ride', 'Ride', 'Sortie à vélo', 30, 26.0, True, True),
+    ('virtualride', 'Virtual Ride', 'Vélo virtuel', 5, 30.0, True, True),
+    ('swim', 'Swim', 'Natation', 7, 3.0, True, False),
+    ('nordicski', 'Nordic Ski', 'Ski de fond', 5, 12.0, True, True),
+    ('walk', 'Walk', 'Marche', 6, 5.0, True, True),
+    ('yoga', 'Yoga', 'Yoga', 4, None, False, False),
+    ('workout', 'Workout', 'Entraînement', 3, None, False, False),
+)
+CUMULATED_SHARES = list(itertools.accumulate(share for (icon, en, fr, share, speed, distance, elevation) in SPORTS))
+EPOCH = datetime.datetime(1970, 1, 1)
+COMMENTS = ('Bravo !', 'Nice one 💪', 'Quelle sortie !', 'Great pace', 'Chapeau', 'See you Sunday?', 'Ça grimpe !')
+
+# Locale of an athlete: thousand and decimal separators, imperial units
+LOCALES = (('en', ',', '.', False), ('fr', '\u202f', ',', False), ('de', '.', ',', False), ('us', ',', '.', True))
+CUMULATED_LOCALE_SHARES = list(itertools.accumulate((40, 30, 20, 10)))
+
+class Athlete(object):
+    def __init__(self, id, name, locale):
+        self.id = id
+        self.name = name
+        (self.language, self.grouping, self.decimal, self.imperial) = locale
+        self.french = self.language == 'fr'
+
+    def number(self, value, decimals=0):
+        '''value written with the separators of the athlete'''
+        return '{:,.{}f}'.format(value, decimals).translate({ord(','): self.grouping, ord('.'): self.decimal})
+
+class Feed(object):
+    '''Cards of a dashboard feed, newest first, page after page'''
+
+    def __init__(self, count, seed=0, now=datetime.datetime(2019, 3, 27, 22, 0, 0)):
+        self.random = random.Random(seed)
+        self.now = now
+        self.time = now
+        self.id = 2200000000
+        # About one athlete per 25 cards, between 20 and 2000 of them
+        self.athletes = [ self.__athlete(1000 + i) for i in range(min(2000, max(20, count // 25))) ]
+
+    def __athlete(self, id):
+        name = '%s %s' % (self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES))
+        locale = LOCALES[bisect.bisect_right(CUMULATED_LOCALE_SHARES, self.random.random() * CUMULATED_LOCALE_SHARES[-1])]
+        return Athlete(id, name, locale)
+
+    def page(self, size):
+        '''Html of a dashboard page of size cards'''
+        cards = ''.join(self.card() for _ in range(size))
+        return PAGE.format(token='ABCD%08d' % self.id, owner_id=42, owner='Owner', nav=NAV, sidebar=SIDEBAR, cards=cards)
+
+    def pages(self, count, size=30):
+        '''Html of the pages of the feed, count cards in total'''
+        while count > 0:
+            yield self.page(min(size, count))
+            count -= size
+
+    def card(self):
+        r = self.random
+        self.id += r.randint(1, 50)
+        self.time -= datetime.timedelta(seconds=int(r.expovariate(1 / 1200.0)))
+        # A few athletes post most of the activities
+        athlete = self.athletes[min(len(self.athletes) - 1, int(r.paretovariate(1.2)) - 1)] if r.random() < 0.5 \
+            else r.choice(self.athletes)
+        sport = SPORTS[bisect.bisect_right(CUMULATED_SHARES, r.random() * CUMULATED_SHARES[-1])]
+        (icon, english, french, share, speed, with_distance, with_elevation) = sport
+        stats = self.stats(athlete, sport)
+
+        timestamp = int((self.time - EPOCH).total_seconds())
+        return CARD.format(
+            rank=timestamp,
+            updated=timestamp + r.randint(0, 3600),
+            id=self.id,
+            athlete_id=athlete.id,
+            name=html.escape(athlete.name),
+            badge='<span class="badge premium"></span>' if r.random() < 0.3 else '',
+            datetime=self.time.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            when=self.when(),
+            location='<div class="location">%s</div>' % html.escape(r.choice(PLACES)) if r.random() < 0.4 else '',
+            icon=icon,
+            title=html.escape(self.title(athlete, english, french)),
+            description='<div class="activity-text">%s</div>' % html.escape(r.choice(COMMENTS)) if r.random() < 0.2 else '',
+            stats=''.join(STAT.format(label=label, value=value) for (label, value) in stats),
+            photos='<div class="photos">%s</div>' % ''.join('<img src="/photos/%d-%d.jpg">' % (self.id, i)
+                for i in range(r.randint(1, 4))) if r.random() < 0.15 else '',
+            kudos=r.randint(0, 40),
+            kudo=KUDO_BUTTON if r.random() < 0.6 else KUDOED_BUTTON,
+            comments='<ul class="comments">%s</ul>' % ''.join(COMMENT.format(id=other.id, name=html.escape(other.name),
+                text=html.escape(r.choice(COMMENTS))) for other in r.sample(self.athletes, r.randint(1, 3)))
+                if r.random() < 0.25 else '')
+
+    def title(self, athlete, english, french):
+        r = self.random
+        (part, partie, start) = ([ part for part in PARTS_OF_DAY if part[2] <= self.time.hour ] or PARTS_OF_DAY[-1:])[-1]
+        choice = r.random()
+        if choice < 0.55:
+            return '%s %s' % (french, partie) if athlete.french else '%s %s' % (part, english)
+        if choice < 0.8:
+            return '%s %s' % (english if r.random() < 0.5 else french, r.choice(PLACES))
+        if choice < 0.9:
+            return '%s with %s' % (english, r.choice(self.athletes).name.split()[0])
+        # Titles of their own, growing the vocabulary
+        return ' '.join(r.choice(('Tempo', 'Intervals', 'Sortie longue', 'Récup', 'Fartlek', 'Côtes', 'Ultra', 'Test FTP')) +
+            ' %d' % r.randint(1, 500) for _ in range(r.randint(1, 2)))
+
+    def when(self):
+        days = (self.now.date() - self.time.date()).days
+        if days >= 7:
+            return '%s %d, %d' % (self.time.strftime('%B'), self.time.day, self.time.year)
+        clock = '%d:%02d %s' % ((self.time.hour - 1) % 12 + 1, self.time.minute, 'AM' if self.time.hour < 12 else 'PM')
+        return 'Today at %s' % clock if days == 0 else 'Yesterday at %s' % clock if days == 1 else clock
+
+    def stats(self, athlete, sport):
+        '''(label, text) of the stats displayed on a card'''
+        r = self.random
+        (icon, english, french, share, speed, with_distance, with_elevation) = sport
+        seconds = int(r.lognormvariate(8.0, 0.6))
+        stats = []
+        if with_distance:
+            stats.append(('Distance', self.distance(seconds * speed / 3.6 * r.uniform(0.8, 1.2), athlete)))
+        stats.append(('Time', self.duration(seconds)))
+        if with_elevation and r.random() < 0.8:
+            stats.append(('Elevation Gain', self.elevation(seconds * r.uniform(0.0, 0.1), athlete)))
+        return stats
+
+    def distance(self, metres, athlete):
+        if athlete.imperial:
+            return '%s mi' % athlete.number(metres / 1609.344, 1)
+        if metres < 1000:
+            return '%d m' % metres
+        return '%s km' % athlete.number(metres / 1000, 2)
+
+    def elevation(self, metres, athlete):
+        if athlete.imperial:
+            return '%s ft' % athlete.number(int(metres / 0.3048))
+        return '%s m' % athlete.number(int(metres))
+
+    def duration(self, seconds):
+        (hours, minutes) = (seconds // 3600, seconds % 3600 // 60)
+        if hours > 0:
+            return '%dh %dm' % (hours, minutes)
+        return '%dm %ds' % (minutes, seconds % 60)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('count', type=int, help='Number of activity cards')
+    parser.add_argument('--page-size', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='Directory the pages are written to')
+    options = parser.parse_args()
+
+    feed = Feed(options.count, options.seed)
+    if not options.output:
+        sys.stdout.write(feed.page(options.count))
+        return 0
+    os.makedirs(options.output, exist_ok=True)
+    for (number, page) in enumerate(feed.pages(options.count, options.page_size), 1):
+        with open(os.path.join(options.output, 'page-%05d.html' % number), 'w', encoding='utf-8') as file:
+            file.write(page)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
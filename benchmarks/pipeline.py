@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+'''Activity pipeline benchmark
+
+Feeds synthetic dashboard pages (see feed.py) through the client the way
+the shell does and times each stage on its own:
+
+    parse    html of a page to a tree (Document.tree)
+    extract  activity records of the cards (StravaScraper.activities)
+    store    activities built and stored (Client.store_activities)
+    filter   selections on dates, sports, athletes, ranges and kudos
+    search   selections on title words (Client.select_activities)
+    render   the activities table of every stored activity
+
+Timings are the best of --repeat runs. An extra run under tracemalloc gives
+the peak memory allocated by each stage, and the memory retained by the
+stored activities (python allocations only, lxml trees are not traced).
+
+Results can be saved as a baseline and later runs compared with it. A
+fixed python workload is timed between the runs and stages are compared in
+units of it, so that a busier or throttled machine does not read as a
+regression. Stages slower or bigger than the tolerance fail, unless the
+change is within the spread of their runs (median over best) or within a
+few milliseconds or kilobytes. Baselines are labelled with the commit of
+the feed.py that generated their cards, they are only comparable with the
+same feed.
+
+    python benchmarks/pipeline.py [--sizes 100,1000,10000] [--repeat 5]
+        [--save NAME] [--compare NAME] [--tolerance 0.25]
+
+NAME is a json file, or a name of benchmarks/baselines/. Save baselines
+with more repeats (--repeat 10) than the runs compared with them.'''
+
+import argparse, collections, contextlib, datetime, json, os, platform, random, statistics, subprocess, sys, tempfile, time, tracemalloc
+
+from feed import Feed
+from stravatools.client import Client
+from stravatools.store import Query
+from stravatools.cli.commands import ACTIVITY_COLUMNS, display_row
+from stravatools.cli.table import FixedWriter
+from stravatools._intern.document import Document
+from stravatools._intern.transport import Transport
+
+STAGES = ('parse', 'extract', 'store', 'filter', 'search', 'render')
+# Changes smaller than these are noise, whatever their ratio
+NOISE = {'seconds': 0.01, 'peak': 64 * 1024}
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINES = os.path.join(HERE, 'baselines')
+
+class Stages(object):
+    '''Seconds spent in each stage and, traced, the highest memory allocated
+    by a single call of it over what was allocated before the call'''
+
+    def __init__(self, traced=False):
+        self.traced = traced
+        self.seconds = collections.OrderedDict((stage, 0.0) for stage in STAGES)
+        self.peaks = collections.OrderedDict((stage, 0) for stage in STAGES)
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        if self.traced:
+            (before, peak) = tracemalloc.get_traced_memory()
+            # Before python 3.9 peaks are the highest since tracing started
+            if hasattr(tracemalloc, 'reset_peak'): tracemalloc.reset_peak()
+        start = time.perf_counter()
+        yield
+        self.seconds[stage] += time.perf_counter() - start
+        if self.traced:
+            (current, peak) = tracemalloc.get_traced_memory()
+            self.peaks[stage] = max(self.peaks[stage], peak - before)
+
+def queries(client):
+    '''(stage, query) selections of the filter and search stages'''
+    newest = client.activities[0].datetime
+    athlete = client.activities[len(client.activities) // 2].athlete.name
+    return [
+        ('filter', Query(since=newest - datetime.timedelta(days=7))),
+        ('filter', Query(sports=['Run'])),
+        ('filter', Query(athlete=athlete)),
+        ('filter', Query(sports=['Bike'], distance=(50000, None), elevation=(500, None))),
+        ('filter', Query(kudoed=False, duration=(None, 30 * 60))),
+        ('search', Query(text='morning run')),
+        ('search', Query(text='sortie velo')),
+        ('search', Query(text='tempo', sports=['Run'])),
+    ]
+
+def run(size, page_size, seed, traced=False):
+    '''Stages of size cards going through a fresh client'''
+    stages = Stages(traced)
+    with tempfile.TemporaryDirectory() as config:
+        client = Client(config, transport=Transport())
+        client.scraper
+        retained = tracemalloc.get_traced_memory()[0] if traced else 0
+        for text in Feed(size, seed).pages(size, page_size):
+            document = Document(text)
+            with stages.measure('parse'):
+                document.tree
+            with stages.measure('extract'):
+                client.scraper.activities(document)
+            with stages.measure('store'):
+                client.store_activities(document)
+        del text, document
+        retained = tracemalloc.get_traced_memory()[0] - retained if traced else 0
+
+        for (stage, query) in queries(client):
+            with stages.measure(stage):
+                client.select_activities(query)
+
+        client.select_activities(Query())
+        with open(os.devnull, 'w', encoding='utf-8') as null, stages.measure('render'):
+            w = FixedWriter(null, [ width for (header, width, cell) in ACTIVITY_COLUMNS ])
+            w.writeheader([ header for (header, width, cell) in ACTIVITY_COLUMNS ])
+            for activity in client.selected_activities[::-1]:
+                w.writerow(display_row(activity))
+        client.close()
+    return (stages, retained)
+
+def calibrate():
+    '''Seconds of a fixed workload of sorting, formatting and dict updates'''
+    r = random.Random(0)
+    values = [ (r.random(), str(i)) for i in range(20000) ]
+    start = time.perf_counter()
+    for _ in range(5):
+        strings = {}
+        for (value, key) in sorted(values):
+            strings[key] = '%s %.3f' % (key, value)
+        ''.join(strings.values())
+    return time.perf_counter() - start
+
+def benchmark(size, options):
+    '''{stage: {seconds, calibrated, spread, peak}} of size cards, with the
+    retained bytes
+
+    calibrated is the best ratio of a run of the stage to the calibration
+    workload timed around that run, spread how much the median ratio is
+    over the best one.'''
+    result = collections.OrderedDict()
+    if options.memory:
+        tracemalloc.start()
+        try:
+            (traced, retained) = run(size, options.page_size, options.seed, traced=True)
+        finally:
+            tracemalloc.stop()
+    runs = []
+    calibration = calibrate()
+    for _ in range(options.repeat):
+        stages = run(size, options.page_size, options.seed)[0]
+        after = calibrate()
+        runs.append((stages, (calibration + after) / 2))
+        calibration = after
+    for stage in STAGES:
+        ratios = sorted(stages.seconds[stage] / calibration for (stages, calibration) in runs)
+        result[stage] = collections.OrderedDict((
+            ('seconds', min(stages.seconds[stage] for (stages, calibration) in runs)),
+            ('calibrated', ratios[0]),
+            ('spread', statistics.median(ratios) / ratios[0] - 1 if ratios[0] > 0 else 0.0),
+        ))
+        if options.memory:
+            result[stage]['peak'] = traced.peaks[stage]
+    if options.memory:
+        result['retained'] = retained
+    return result
+
+def git(*args):
+    try:
+        return subprocess.run(('git',) + args, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, cwd=HERE,
+            universal_newlines=True).stdout.strip()
+    except OSError:
+        return ''
+
+def commit(*paths):
+    '''Short commit of the last change to the paths (of HEAD without paths),
+    with a + when they have uncommitted changes'''
+    last = git('log', '-1', '--format=%h', '--', *paths) if paths else git('rev-parse', '--short', 'HEAD')
+    return last + ('+' if last and git('status', '--porcelain', '--untracked-files=no', '--', *(paths or ('..',))) else '')
+
+def environment():
+    return collections.OrderedDict((
+        ('date', datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')),
+        ('commit', commit()),
+        ('feed', commit('feed.py')),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('processor', platform.processor() or platform.machine()),
+    ))
+
+def baseline_path(name):
+    if name.endswith('.json') or os.sep in name:
+        return name
+    return os.path.join(BASELINES, name + '.json')
+
+def kilobytes(size):
+    return '%.0f kB' % (size / 1024.0)
+
+def report(size, result, baseline, tolerance):
+    '''Prints the stages of a size and returns the regressions'''
+    print('%d cards' % size)
+    print('  %-8s %10s %12s %10s  %s' % ('Stage', 'Seconds', 'us/card', 'Peak', 'Baseline'))
+    regressions = []
+    for stage in STAGES:
+        (seconds, peak) = (result[stage]['seconds'], result[stage].get('peak'))
+        compared = ''
+        if baseline and stage in baseline:
+            before = baseline[stage]
+            changes = []
+            for (metric, value) in (('seconds', seconds), ('peak', peak)):
+                if value is None or not before.get(metric):
+                    continue
+                (change, noise) = (value / before[metric] - 1, 0.0)
+                if metric == 'seconds' and before.get('calibrated'):
+                    # In units of the calibration workload, within the spread of the runs
+                    change = result[stage]['calibrated'] / before['calibrated'] - 1
+                    noise = max(result[stage]['spread'], before['spread'])
+                changes.append('%s %+.0f%%' % (metric, change * 100))
+                if change > tolerance + noise and value - before[metric] > NOISE[metric]:
+                    regressions.append('%d cards, %s %s %+.0f%%' % (size, stage, metric, change * 100))
+            compared = ', '.join(changes)
+        print('  %-8s %10.3f %12.1f %10s  %s' % (stage, seconds, seconds / size * 1e6,
+            kilobytes(peak) if peak is not None else '', compared))
+    if 'retained' in result:
+        print('  retained %s, %.0f bytes per activity' % (kilobytes(result['retained']), result['retained'] / float(size)))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='100,1000,10000', help='Comma separated numbers of cards, up to 1000000')
+    parser.add_argument('--page-size', type=int, default=30, help='Cards per feed page (default 30)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed runs per size, the best one is kept (default 5)')
+    parser.add_argument('--no-memory', dest='memory', action='store_false', help='Skip the run under tracemalloc')
+    parser.add_argument('--save', metavar='NAME', help='Save the results as a baseline')
+    parser.add_argument('--compare', metavar='NAME', help='Compare the results with a saved baseline')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Slowdown or growth reported as a regression (default 0.25)')
+    options = parser.parse_args()
+    sizes = [ int(size) for size in options.sizes.split(',') ]
+
+    baseline = {}
+    if options.compare:
+        with open(baseline_path(options.compare), encoding='utf-8') as file:
+            baseline = json.load(file)
+        label = baseline['environment']
+        print('Compared with %s (commit %s, feed %s, python %s)' % (options.compare, label['commit'], label.get('feed'), label['python']))
+        feed = commit('feed.py')
+        if label.get('feed') != feed:
+            print('Warning: the baseline cards come from feed.py %s, this run from %s' % (label.get('feed'), feed))
+
+    results = collections.OrderedDict()
+    regressions = []
+    for size in sizes:
+        results[str(size)] = benchmark(size, options)
+        regressions += report(size, results[str(size)], baseline.get('results', {}).get(str(size)), options.tolerance)
+
+    if options.save:
+        path = baseline_path(options.save)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        saved = {'environment': environment(), 'page_size': options.page_size, 'seed': options.seed, 'repeat': options.repeat,
+            'results': results}
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(saved, file, indent=2)
+            file.write('\n')
+        print('Saved %s' % path)
+
+    for regression in regressions:
+        print('REGRESSION: %s' % regression)
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
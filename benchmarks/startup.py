@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+'''Startup time of strava-shell
+
+Imports the shell in fresh interpreters with python -X importtime, checks
+that none of the heavy libraries (requests, lxml, numpy, pyarrow) get
+imported before they are needed and fails when the median import time is
+over budget.
+
+    python benchmarks/startup.py [--runs 5] [--budget 150]'''
+
+import argparse, statistics, subprocess, sys, tempfile
+
+MODULE = 'stravatools.cli.shell'
+DEFERRED = ('requests', 'urllib3', 'lxml', 'numpy', 'pyarrow', 'sqlite3')
+
+# Builds a client the way main() does, without starting the prompt
+CLIENT = '''
+import sys
+from stravatools.client import Client
+from stravatools._intern.transport import Transport
+Client(sys.argv[1], transport=Transport()).close()
+'''
+
+def importtime(code, *args):
+    '''{module: cumulative microseconds} of a fresh interpreter running code'''
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code] + list(args),
+        stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            (own, cumulative, module) = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget', type=float, default=150, help='Maximum median import time in ms')
+    options = parser.parse_args()
+
+    runs = [ importtime('import %s' % MODULE) for _ in range(options.runs) ]
+    median = statistics.median(run[MODULE] for run in runs) / 1000.0
+    print('import %s: %.1f ms (median of %d)' % (MODULE, median, options.runs))
+
+    with tempfile.TemporaryDirectory() as config:
+        client = importtime(CLIENT, config)
+    built = sorted(set(module.split('.')[0] for module in client) & set(DEFERRED))
+    print('client construction imports: %s' % (', '.join(built) or 'nothing heavy'))
+
+    failures = []
+    if median > options.budget:
+        failures.append('import time %.1f ms is over the %.0f ms budget' % (median, options.budget))
+    eager = sorted(set(module.split('.')[0] for module in runs[0]) & set(DEFERRED))
+    if eager:
+        failures.append('%s imported by %s' % (', '.join(eager), MODULE))
+    if built:
+        failures.append('%s imported by the client construction' % ', '.join(built))
+    for failure in failures:
+        print('FAIL: %s' % failure)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
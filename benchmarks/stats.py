@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+'''Stat parsing benchmark
+
+Parses the stat texts of a synthetic feed (see feed.py: en, fr, de and us
+separators and units) with the memoized converters of stats.py, with the
+same converters without their cache and with the regular expressions they
+replaced, and prints stats per second of each.
+
+    python benchmarks/stats.py [--count 100000] [--repeat 3] [--seed 0]'''
+
+import argparse, re, sys, time
+
+from feed import Feed, SPORTS
+from stravatools._intern import stats
+from stravatools._intern.units import Distance, Duration, Elevation, UNIT_EMPTY
+
+# The converters of scraper.py before stats.py, for reference
+def previous_distance(value, cls=Distance):
+    m = re.search(r'\s*(.+)\s+(km|m)\s*', value)
+    if m:
+        num = float(re.sub(r'[^\d\.]', '', m.group(1)))
+        if m.group(2) == 'km':
+            num = num * 1000
+        return cls(num)
+    return UNIT_EMPTY
+
+def previous_elevation(value):
+    return previous_distance(value, Elevation)
+
+def previous_duration(value):
+    units = {
+        'h': lambda s: int(s) * 60 * 60,
+        'm': lambda s: int(s) * 60,
+        's': lambda s: int(s),
+    }
+    m = re.search(r'\s*(\d+)([hms])\s+(\d+)([hms])\s*', value)
+    if m:
+        (s1, t1, s2, t2) = m.groups()
+        return Duration(units[t1](s1) + units[t2](s2))
+    return UNIT_EMPTY
+
+CONVERTERS = (
+    ('memoized', {'Distance': stats.to_distance, 'Time': stats.to_duration, 'Elevation Gain': stats.to_elevation}),
+    ('uncached', {'Distance': stats.to_distance.__wrapped__, 'Time': stats.to_duration.__wrapped__,
+        'Elevation Gain': stats.to_elevation.__wrapped__}),
+    ('previous', {'Distance': previous_distance, 'Time': previous_duration, 'Elevation Gain': previous_elevation}),
+)
+
+def feed_stats(count, seed):
+    '''(label, text) of count stats of the cards of a feed'''
+    feed = Feed(count // 2, seed)
+    texts = []
+    while len(texts) < count:
+        athlete = feed.random.choice(feed.athletes)
+        texts.extend(feed.stats(athlete, feed.random.choice(SPORTS)))
+    return texts[:count]
+
+def parse(texts, converters):
+    for (label, text) in texts:
+        converters[label](text)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=100000, help='Number of stats (default 100000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per converter, the best one is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    texts = feed_stats(options.count, options.seed)
+    print('%d stats, %d distinct' % (len(texts), len(set(texts))))
+    for (name, converters) in CONVERTERS:
+        best = None
+        for _ in range(options.repeat):
+            # Every run starts with empty caches
+            for converter in (stats.to_distance, stats.to_duration, stats.to_elevation):
+                converter.cache_clear()
+            start = time.perf_counter()
+            parse(texts, converters)
+            seconds = time.perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        print('  %-9s %8.3f s %12.0f stats/s' % (name, best, len(texts) / best))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
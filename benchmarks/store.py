@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+'''Per page store cost benchmark
+
+Fills an ActivityStore with 10k, 100k and 1M activities, then times adding
+one more feed page of activities to it: newer than all of them (sync),
+older than all of them (load --all), spread among them and already stored.
+The cost of a page should stay flat whatever the size of the store.
+
+    python benchmarks/store.py [--sizes 10000,100000,1000000] [--pages 100] [--page-size 30]'''
+
+import argparse, datetime, random, statistics, sys, time
+
+from feed import FIRST_NAMES, LAST_NAMES, PLACES
+from stravatools.client import Activity
+from stravatools.store import ActivityStore
+from stravatools._intern.units import Distance, Duration, Elevation
+
+KINDS = ('Run', 'Bike', 'Swim', 'Ski', 'Sport')
+START = datetime.datetime(2019, 3, 27, 22, 0, 0)
+
+class Activities(object):
+    '''Activities of synthetic records, the ones of feed pages once extracted'''
+
+    def __init__(self, seed=0):
+        self.random = random.Random(seed)
+        self.id = 3000000000
+        self.athletes = [ '%s %s' % (self.random.choice(FIRST_NAMES), self.random.choice(LAST_NAMES)) for _ in range(500) ]
+
+    def at(self, when):
+        r = self.random
+        self.id += 1
+        return Activity(None, {
+            'id': str(self.id),
+            'athlete_name': r.choice(self.athletes),
+            'datetime': when,
+            'title': '%s %s' % (r.choice(('Morning Run', 'Lunch Ride', 'Sortie à vélo', 'Evening Swim', 'Tempo')), r.choice(PLACES)),
+            'kind': r.choice(KINDS),
+            'distance': Distance(r.uniform(1000, 100000)),
+            'duration': Duration(r.randint(600, 20000)),
+            'elevation': Elevation(r.uniform(0, 2000)),
+            'kudoed': r.random() < 0.5,
+        })
+
+    def between(self, newest, oldest, count):
+        '''count activities, newest first, evenly spread over [oldest, newest]'''
+        step = (newest - oldest) / max(1, count)
+        return [ self.at(newest - step * i) for i in range(count) ]
+
+def page_seconds(store, pages):
+    '''Median seconds of adding each page to the store'''
+    seconds = []
+    for page in pages:
+        start = time.perf_counter()
+        store.add(page)
+        seconds.append(time.perf_counter() - start)
+    return statistics.median(seconds)
+
+def benchmark(size, options):
+    activities = Activities(options.seed)
+    minute = datetime.timedelta(minutes=1)
+    # Stored activities one every 20 minutes back from START
+    (newest, oldest) = (START, START - size * 20 * minute)
+    store = ActivityStore()
+    for page in range(0, size, 1000):
+        store.add(activities.between(newest - page * 20 * minute, newest - (page + 1000) * 20 * minute, min(1000, size - page)))
+
+    count = options.page_size
+    cases = (
+        ('newer', [ activities.between(newest + (i + 1) * count * minute, newest + i * count * minute + minute, count)
+            for i in range(options.pages) ]),
+        ('older', [ activities.between(oldest - i * count * minute - minute, oldest - (i + 1) * count * minute, count)
+            for i in range(options.pages) ]),
+        ('spread', [ [ activities.at(oldest + (newest - oldest) * activities.random.random()) for _ in range(count) ]
+            for i in range(options.pages) ]),
+        ('stored', [ [ store[activities.random.randrange(size)] for _ in range(count) ] for i in range(options.pages) ]),
+    )
+    return [ (case, page_seconds(store, pages)) for (case, pages) in cases ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma separated numbers of stored activities')
+    parser.add_argument('--pages', type=int, default=100, help='Pages added per case (default 100)')
+    parser.add_argument('--page-size', type=int, default=30, help='Activities per page (default 30)')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+
+    print('Median cost of storing a page of %d activities' % options.page_size)
+    print('  %10s %10s %10s %10s %10s' % (('Stored',) + tuple(case for case in ('newer', 'older', 'spread', 'stored'))))
+    for size in [ int(size) for size in options.sizes.split(',') ]:
+        results = benchmark(size, options)
+        print('  %10d %s' % (size, ' '.join('%8.0f us' % (seconds * 1e6) for (case, seconds) in results)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
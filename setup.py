@@ -25,7 +25,7 @@ setup(
     author='Pierrick Terrettaz',
     author_email='pierrick@gmail.com',
     url='https://github.com/terrettaz/strava-tools',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*']),
     classifiers=[
         "License :: OSI Approved :: MIT License",
         "Development Status :: 3 - Alpha",
@@ -33,9 +33,15 @@ setup(
         "Topic :: Utilities"
     ],
     install_requires=requirements,
+    extras_require={
+        'stats': ['numpy'],
+        'parquet': ['pyarrow'],
+    },
      entry_points={
         'console_scripts': [
-            'strava-shell = stravatools.cli.shell:main'
+            'strava-shell = stravatools.cli.shell:main',
+            'strava-daemon = stravatools.cli.daemon:main',
+            'strava-multi = stravatools.cli.multi:main',
         ],
     },
 )
\ No newline at end of file
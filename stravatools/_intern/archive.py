@@ -0,0 +1,74 @@
+# Bulk import of saved dashboard pages
+#
+# Pages are parsed in worker processes, which only send back the rows of
+# their records (see records.py).
+
+import glob, os, time
+
+from concurrent.futures import ProcessPoolExecutor
+from stravatools._intern.records import to_row, to_record
+
+PAGE_SUFFIXES = ('.html', '.htm')
+
+def find_pages(patterns):
+    '''Files of the patterns: files, directories (searched recursively for
+    saved pages) and glob patterns, in order and without duplicates'''
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            paths = sorted(path for path in glob.glob(os.path.join(pattern, '**', '*'), recursive=True)
+                if path.lower().endswith(PAGE_SUFFIXES))
+        else:
+            paths = sorted(glob.glob(pattern, recursive=True)) or [pattern]
+        for path in paths:
+            if path not in seen and not os.path.isdir(path):
+                seen.add(path)
+                yield path
+
+def parse_page(path):
+    '''(path, rows, error) of a saved page, in a worker process'''
+    from stravatools._intern.document import Document
+    from stravatools.scraper import CARD_EXTRACTOR
+    try:
+        with open(path, encoding='utf-8') as file:
+            document = Document(file.read())
+        if document.tree is None:
+            return (path, [], 'not a page')
+        errors = []
+        records = document.records(CARD_EXTRACTOR, lambda error, card: errors.append(error))
+        return (path, [ to_row(record) for record in records ], '%d unparsable activities' % len(errors) if errors else None)
+    except Exception as e:
+        return (path, [], str(e) or e.__class__.__name__)
+
+class Import(object):
+    '''Result of a bulk import: pages parsed, their records, pages with
+    errors as (path, error), elapsed seconds and new activities stored'''
+
+    def __init__(self):
+        self.new = 0
+        self.pages = 0
+        self.records = []
+        self.failures = []
+        self.seconds = 0.0
+
+def parse_pages(paths, workers=None):
+    '''Parses the pages over a process pool, all records are returned at once'''
+    result = Import()
+    start = time.perf_counter()
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) <= 1:
+        collect(result, map(parse_page, paths))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # A few chunks per worker keep them busy until the end
+            collect(result, executor.map(parse_page, paths, chunksize=max(1, len(paths) // (workers * 8))))
+    result.seconds = time.perf_counter() - start
+    return result
+
+def collect(result, results):
+    for (path, rows, error) in results:
+        result.pages += 1
+        result.records.extend(map(to_record, rows))
+        if error:
+            result.failures.append((path, error))
@@ -0,0 +1,124 @@
+import gzip, hashlib, json, os, time
+
+from datetime import datetime
+from stravatools._intern import units
+from stravatools._intern.records import format_datetime, parse_datetime, to_unit
+
+def encode_value(value):
+    if isinstance(value, datetime):
+        return {'datetime': format_datetime(value)}
+    if isinstance(value, units.Unit):
+        return {'unit': value.__class__.__name__, 'value': value.value}
+    return value
+
+def decode_value(value):
+    if isinstance(value, dict) and 'datetime' in value:
+        return parse_datetime(value['datetime'])
+    if isinstance(value, dict) and 'unit' in value:
+        return to_unit(getattr(units, value['unit']), value['value'])
+    return value
+
+def encode_record(record):
+    return { key: encode_value(value) for key, value in record.items() }
+
+def decode_record(record):
+    return { key: decode_value(value) for key, value in record.items() }
+
+def file_size(path):
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+class ResponseCache(object):
+    '''Feed pages cached on disk together with their extracted records
+
+    Entries younger than ttl seconds are served without any request, older
+    ones are revalidated with their ETag / Last-Modified validators. The
+    least recently used entries are evicted beyond max_size bytes: the size
+    of the entries is kept as they are written, the directory is only
+    listed when it goes over.'''
+
+    SUFFIX = '.json.gz'
+
+    def __init__(self, path, ttl=3600, max_size=50*1024*1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.__size = None
+
+    def __file(self, url):
+        return self.path / (hashlib.sha1(url.encode('utf-8')).hexdigest() + ResponseCache.SUFFIX)
+
+    def get(self, url):
+        path = self.__file(url)
+        try:
+            with gzip.open(str(path), 'rt', encoding='utf-8') as file:
+                entry = json.loads(file.read())
+        except (OSError, ValueError):
+            return None
+        if entry.get('url') != url:
+            return None
+        # Access time drives the LRU eviction
+        os.utime(str(path), None)
+        entry['records'] = list(map(decode_record, entry['records']))
+        return entry
+
+    def is_fresh(self, entry):
+        return time.time() - entry['stored_at'] < self.ttl
+
+    def validators(self, entry):
+        headers = {}
+        if entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def revalidated(self, entry):
+        entry['stored_at'] = time.time()
+        self.__write(entry)
+
+    def put(self, url, response, records):
+        self.__write({
+            'url': url,
+            'stored_at': time.time(),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'records': records,
+        })
+        if self.size() > self.max_size:
+            self.evict()
+
+    def size(self):
+        '''Bytes of the cached entries'''
+        if self.__size is None:
+            self.__size = sum(path.stat().st_size for path in self.path.glob('*' + ResponseCache.SUFFIX))
+        return self.__size
+
+    def __write(self, entry):
+        path = self.__file(entry['url'])
+        data = dict(entry, records=list(map(encode_record, entry['records'])))
+        partial = path.with_name(path.name + '.tmp')
+        with gzip.open(str(partial), 'wt', encoding='utf-8') as file:
+            file.write(json.dumps(data))
+        replaced = file_size(path)
+        os.replace(str(partial), str(path))
+        if self.__size is not None:
+            self.__size += file_size(path) - replaced
+
+    def evict(self):
+        entries = sorted(
+            ((path, path.stat()) for path in self.path.glob('*' + ResponseCache.SUFFIX)),
+            key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for (path, stat) in entries)
+        for (path, stat) in entries:
+            if size <= self.max_size: break
+            size -= stat.st_size
+            try: path.unlink()
+            except OSError: pass
+        self.__size = size
+
+    def clear(self):
+        for path in self.path.glob('*' + ResponseCache.SUFFIX):
+            path.unlink()
+        self.__size = 0
@@ -0,0 +1,92 @@
+import base64, collections, gzip, json, threading
+
+import requests
+
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+# Bodies are stored decoded, and session secrets are never written
+DROPPED_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding', 'set-cookie')
+
+class Capture(object):
+    '''Request/response pairs of a session stored compressed in a directory,
+    one file per exchange in the order they were made
+
+    Request bodies and cookies are not recorded, so a capture never holds
+    credentials. Exchanges are matched back by method and URL.'''
+
+    SUFFIX = '.json.gz'
+
+    def __init__(self, path):
+        self.path = path
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.sequence = len(list(self.path.glob('*' + Capture.SUFFIX)))
+        self.exchanges = None
+
+    def record(self, request, response):
+        exchange = {
+            'method': request.method,
+            'url': request.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': { k: v for k, v in response.headers.items() if k.lower() not in DROPPED_HEADERS },
+            'body': base64.b64encode(response.content).decode('ascii'),
+        }
+        with self.lock:
+            self.sequence += 1
+            path = self.path / ('%06d%s' % (self.sequence, Capture.SUFFIX))
+        with gzip.open(str(path), 'wt', encoding='utf-8') as file:
+            file.write(json.dumps(exchange))
+
+    def __load(self):
+        exchanges = collections.defaultdict(collections.deque)
+        for path in sorted(self.path.glob('*' + Capture.SUFFIX)):
+            with gzip.open(str(path), 'rt', encoding='utf-8') as file:
+                exchange = json.loads(file.read())
+            exchanges[(exchange['method'], exchange['url'])].append(exchange)
+        return exchanges
+
+    def replay(self, request):
+        with self.lock:
+            if self.exchanges is None:
+                self.exchanges = self.__load()
+            queue = self.exchanges.get((request.method, request.url))
+            if not queue:
+                raise requests.ConnectionError('No captured response for %s %s' % (request.method, request.url), request=request)
+            # The last exchange of a request keeps being served once the others are consumed
+            exchange = queue.popleft() if len(queue) > 1 else queue[0]
+
+        response = requests.Response()
+        response.status_code = exchange['status']
+        response.reason = exchange['reason']
+        response.headers = CaseInsensitiveDict(exchange['headers'])
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = base64.b64decode(exchange['body'])
+        # The body is already read: streamed and closed responses are served from it
+        response._content_consumed = True
+        response.url = request.url
+        response.request = request
+        return response
+
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, capture, **kwargs):
+        super(RecordingAdapter, self).__init__(**kwargs)
+        self.capture = capture
+
+    def send(self, request, **kwargs):
+        response = super(RecordingAdapter, self).send(request, **kwargs)
+        self.capture.record(request, response)
+        return response
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, capture):
+        super(ReplayAdapter, self).__init__()
+        self.capture = capture
+
+    def send(self, request, **kwargs):
+        return self.capture.replay(request)
+
+    def close(self):
+        pass
@@ -0,0 +1,104 @@
+# Sorted list split in bounded chunks
+#
+# A single Python list moves every item after the insertion point: adding
+# a page at the front of a million activities costs a copy of the whole
+# list. Chunks keep that copy within one chunk of a few hundred items,
+# whichever end or middle of the list the page goes to.
+
+import bisect, itertools
+
+CHUNK_SIZE = 512
+
+class SortedChunks(object):
+    '''Items sorted by their keys, equal keys in insertion order
+
+    Chunks hold between 1 and 2 * size items, maxes is the last key of each
+    chunk. Inserting finds the chunk with a bisection over maxes then only
+    moves that chunk; positions walk the chunk lengths.'''
+
+    def __init__(self, size=CHUNK_SIZE):
+        self.size = size
+        self.keys = []
+        self.items = []
+        self.maxes = []
+        self.length = 0
+
+    def insert(self, keys, items):
+        '''Inserts the sorted keys and their items after the equal keys
+        already stored, a run of keys falling in the same gap at once'''
+        if len(keys) == 0:
+            return
+        self.length += len(keys)
+        if len(self.maxes) == 0:
+            (self.keys, self.items, self.maxes) = ([list(keys)], [list(items)], [keys[-1]])
+            self.__split(0)
+            return
+        start = 0
+        while start < len(keys):
+            c = min(bisect.bisect_right(self.maxes, keys[start]), len(self.maxes) - 1)
+            (chunk_keys, chunk_items) = (self.keys[c], self.items[c])
+            i = bisect.bisect_right(chunk_keys, keys[start])
+            # Keys up to the next stored one go in this gap
+            end = bisect.bisect_left(keys, chunk_keys[i], start) if i < len(chunk_keys) else len(keys)
+            chunk_keys[i:i] = keys[start:end]
+            chunk_items[i:i] = items[start:end]
+            self.maxes[c] = chunk_keys[-1]
+            self.__split(c)
+            start = end
+
+    def __split(self, c):
+        (keys, items) = (self.keys[c], self.items[c])
+        if len(keys) > 2 * self.size:
+            starts = range(0, len(keys), self.size)
+            self.keys[c:c + 1] = [ keys[i:i + self.size] for i in starts ]
+            self.items[c:c + 1] = [ items[i:i + self.size] for i in starts ]
+            self.maxes[c:c + 1] = [ keys[min(i + self.size, len(keys)) - 1] for i in starts ]
+
+    def __offset(self, c):
+        return sum(map(len, itertools.islice(self.keys, c)))
+
+    def bisect_left(self, key):
+        c = bisect.bisect_left(self.maxes, key)
+        if c == len(self.maxes):
+            return self.length
+        return self.__offset(c) + bisect.bisect_left(self.keys[c], key)
+
+    def bisect_right(self, key):
+        c = bisect.bisect_right(self.maxes, key)
+        if c == len(self.maxes):
+            return self.length
+        return self.__offset(c) + bisect.bisect_right(self.keys[c], key)
+
+    def __slice(self, low, high):
+        items = []
+        for chunk in self.items:
+            if low < len(chunk) and high > 0:
+                items.extend(chunk[max(0, low):high])
+            (low, high) = (low - len(chunk), high - len(chunk))
+            if high <= 0:
+                break
+        return items
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return itertools.chain.from_iterable(self.items)
+
+    def __reversed__(self):
+        return itertools.chain.from_iterable(map(reversed, reversed(self.items)))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            if index.step is None or index.step == 1:
+                (low, high, step) = index.indices(self.length)
+                return self.__slice(low, high)
+            return list(self)[index]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError('index out of range')
+        for chunk in self.items:
+            if index < len(chunk):
+                return chunk[index]
+            index -= len(chunk)
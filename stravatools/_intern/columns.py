@@ -0,0 +1,122 @@
+from stravatools._intern.records import EPOCH
+
+# numpy is slow to import, so it is only imported by the first Columns
+numpy = None
+
+def import_numpy():
+    global numpy
+    if numpy is None:
+        try:
+            import numpy as module
+        except ImportError:
+            raise ImportError('numpy is required for activity statistics')
+        numpy = module
+
+GROUP_KEYS = ('athlete', 'sport', 'week', 'month')
+
+def encode(index, categories, values, count):
+    '''Codes of values in a categorical index, extended with new values'''
+    def code(value):
+        if value not in index:
+            index[value] = len(categories)
+            categories.append(value)
+        return index[value]
+    return numpy.fromiter(map(code, values), dtype=numpy.int64, count=count)
+
+def float_values(values, count):
+    return numpy.fromiter((value if value is not None else numpy.nan for value in values), dtype=numpy.float64, count=count)
+
+def datetime_values(datetimes, count):
+    seconds = numpy.fromiter(((d - EPOCH).total_seconds() if d else numpy.nan for d in datetimes), dtype=numpy.float64, count=count)
+    values = numpy.nan_to_num(seconds).astype(numpy.int64).astype('datetime64[s]')
+    values[numpy.isnan(seconds)] = numpy.datetime64('NaT')
+    return values
+
+class Columns(object):
+    '''Columnar copy of activities: datetimes, metres, seconds, elevation
+    and categorical athlete / sport codes, ready for vectorized aggregation
+
+    Aggregates do not depend on the order of activities, so columns are
+    only ever appended to as activities get stored.'''
+
+    def __init__(self, activities=[]):
+        import_numpy()
+        self.size = 0
+        self.datetimes = numpy.empty(0, dtype='datetime64[s]')
+        self.metres = numpy.empty(0, dtype=numpy.float64)
+        self.seconds = numpy.empty(0, dtype=numpy.float64)
+        self.elevation = numpy.empty(0, dtype=numpy.float64)
+        self.athlete_codes = numpy.empty(0, dtype=numpy.int64)
+        self.sport_codes = numpy.empty(0, dtype=numpy.int64)
+        (self.athletes, self.__athletes) = ([], {})
+        (self.sports, self.__sports) = ([], {})
+        self.extend(activities)
+
+    def extend(self, activities):
+        activities = list(activities)
+        count = len(activities)
+        if count == 0:
+            return
+        append = lambda column, values: numpy.concatenate((column, values))
+        self.datetimes = append(self.datetimes, datetime_values((a.datetime for a in activities), count))
+        self.metres = append(self.metres, float_values((a.distance_m for a in activities), count))
+        self.seconds = append(self.seconds, float_values((a.duration_s for a in activities), count))
+        self.elevation = append(self.elevation, float_values((a.elevation_m for a in activities), count))
+        self.athlete_codes = append(self.athlete_codes, encode(self.__athletes, self.athletes, (a.athlete for a in activities), count))
+        self.sport_codes = append(self.sport_codes, encode(self.__sports, self.sports, (a.sport.name for a in activities), count))
+        self.size += count
+
+    def group(self, key):
+        '''(codes, labels) of the given grouping key'''
+        if key == 'athlete':
+            return (self.athlete_codes, [ athlete.name for athlete in self.athletes ])
+        if key == 'sport':
+            return (self.sport_codes, self.sports)
+        if key == 'week':
+            # datetime64 weeks start on Thursday, shift them to Monday
+            days = self.datetimes.astype('datetime64[D]').astype(numpy.int64)
+            starts = ((days + 3) // 7) * 7 - 3
+            (codes, labels) = numpy.unique(starts, return_inverse=True)
+            return (labels.astype(numpy.int64), [ str(numpy.datetime64(int(day), 'D')) for day in codes ])
+        if key == 'month':
+            months = self.datetimes.astype('datetime64[M]')
+            (codes, labels) = numpy.unique(months, return_inverse=True)
+            return (labels.astype(numpy.int64), [ str(month) for month in codes ])
+        raise ValueError('Unknown group key %s' % key)
+
+    def summarize(self, keys=()):
+        '''Totals per group of the given keys, sorted by group labels
+
+        Yields (labels, count, metres, seconds, elevation, speed) where speed
+        (m/s) only accounts for activities with both a distance and a time.'''
+        if self.size == 0:
+            return
+        codes = numpy.zeros(self.size, dtype=numpy.int64)
+        groupings = [ self.group(key) for key in keys ]
+        for (key_codes, key_labels) in groupings:
+            codes = codes * len(key_labels) + key_codes
+        (groups, inverse) = numpy.unique(codes, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        total = lambda values: numpy.bincount(inverse, weights=numpy.nan_to_num(values), minlength=len(groups))
+
+        moving = ~numpy.isnan(self.metres) & ~numpy.isnan(self.seconds) & (self.metres > 0) & (self.seconds > 0)
+        counts = numpy.bincount(inverse, minlength=len(groups))
+        metres = total(self.metres)
+        seconds = total(self.seconds)
+        elevation = total(self.elevation)
+        moving_metres = total(numpy.where(moving, self.metres, 0))
+        moving_seconds = total(numpy.where(moving, self.seconds, 0))
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            speeds = numpy.where(moving_seconds > 0, moving_metres / moving_seconds, numpy.nan)
+
+        def labels(code):
+            group = []
+            for (key_codes, key_labels) in reversed(groupings):
+                (code, index) = divmod(int(code), len(key_labels))
+                group.insert(0, key_labels[index])
+            return tuple(group)
+
+        rows = [ (labels(code), int(counts[i]), float(metres[i]), float(seconds[i]), float(elevation[i]), float(speeds[i]))
+            for i, code in enumerate(groups) ]
+        for row in sorted(rows, key=lambda row: tuple(str(label) for label in row[0])):
+            yield row
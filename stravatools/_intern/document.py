@@ -0,0 +1,109 @@
+import re
+
+import lxml.html
+
+from stravatools._intern.metrics import NO_METRICS
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+
+CSRF_META = re.compile(r'<meta\s[^>]*name=["\']csrf-token["\'][^>]*>', re.IGNORECASE)
+CONTENT_ATTR = re.compile(r'content=["\']([^"\']*)["\']', re.IGNORECASE)
+RANKED_DIV = re.compile(r'<div\s[^>]*data-rank=[^>]*>')
+CLASS_ATTR = re.compile(r'class=["\']([^"\']*)["\']')
+RANK_ATTR = re.compile(r'data-rank=["\']([^"\']*)["\']')
+UPDATED_ATTR = re.compile(r'data-updated-at=["\']([^"\']*)["\']')
+DATETIME_ATTR = re.compile(r'<time\s[^>]*datetime=["\']([^"\']*)["\']')
+FEED_ENTRY_CLASSES = frozenset(['activity', 'feed-entry', 'card'])
+
+def is_html(response):
+    content_type = response.headers.get('Content-Type', '')
+    return content_type.split(';')[0].strip().lower() in HTML_CONTENT_TYPES
+
+def scan_csrf_token(text):
+    meta = CSRF_META.search(text)
+    if meta:
+        content = CONTENT_ATTR.search(meta.group(0))
+        if content: return content.group(1)
+    return None
+
+def feed_params(records):
+    '''(cursor, before) feed parameters: the lowest rank and the updated-at
+    of the oldest feed entry card'''
+    entries = [ entry
+        for entry in records
+        if entry['feed_entry'] and entry['datetime'] ]
+    if len(entries) > 0:
+        return (min(entries, key=lambda entry:entry['rank'])['rank'],
+                min(entries, key=lambda entry:entry['datetime'])['updated_at'])
+    return None
+
+def scan_feed_cursor(text):
+    '''Reads the feed_params straight from the raw page, without parsing it'''
+    cards = list(RANKED_DIV.finditer(text))
+    entries = []
+    for i, card in enumerate(cards):
+        tag = card.group(0)
+        classes = CLASS_ATTR.search(tag)
+        if not classes or not FEED_ENTRY_CLASSES <= set(classes.group(1).split()):
+            continue
+        end = cards[i+1].start() if i+1 < len(cards) else len(text)
+        rank = RANK_ATTR.search(tag)
+        updated = UPDATED_ATTR.search(tag)
+        when = DATETIME_ATTR.search(text, card.end(), end)
+        if rank and updated and when:
+            entries.append((rank.group(1), updated.group(1), when.group(1)))
+    if len(entries) > 0:
+        return (min(entries, key=lambda entry:entry[0])[0], min(entries, key=lambda entry:entry[2])[1])
+    return None
+
+class Document(object):
+    '''HTML page parsed on first access and shared by every reader
+
+    A document can also be built from already extracted records, in which
+    case it is never parsed. on_records is called once the records of the
+    page have been extracted. Parse and extract times go to metrics.'''
+
+    def __init__(self, text=None, records=None, on_records=None, metrics=NO_METRICS):
+        self.text = text
+        self.on_records = on_records
+        self.metrics = metrics
+        self.__tree = None
+        self.__records = records
+
+    @classmethod
+    def of(cls, response, metrics=NO_METRICS):
+        if is_html(response):
+            return cls(response.text, metrics=metrics)
+        return EMPTY_DOCUMENT
+
+    @property
+    def tree(self):
+        if self.__tree is None and self.text:
+            with self.metrics.measure('parse'):
+                self.__tree = lxml.html.document_fromstring(self.text)
+        return self.__tree
+
+    def xpath(self, path):
+        tree = self.tree
+        return path(tree) if tree is not None else []
+
+    def records(self, extractor, on_error=None):
+        if self.__records is None:
+            tree = self.tree
+            with self.metrics.measure('extract') as fields:
+                self.__records = list(extractor.extract(tree, on_error)) if tree is not None else []
+                fields['activities'] = len(self.__records)
+            if self.on_records: self.on_records(self.__records)
+        return self.__records
+
+    def feed_cursor(self):
+        if self.text:
+            return scan_feed_cursor(self.text)
+        if self.__records is not None:
+            return feed_params(self.__records)
+        return None
+
+    def csrf_token(self):
+        return scan_csrf_token(self.text) if self.text else None
+
+EMPTY_DOCUMENT = Document()
@@ -0,0 +1,78 @@
+import re
+
+from lxml import etree
+
+def has_class(name):
+    return "contains(concat(' ', normalize-space(@class), ' '), ' %s ')" % name
+
+def xpath(expression):
+    return etree.XPath(expression)
+
+CARDS = xpath("//div[%s]" % has_class('activity'))
+OWNER = xpath(".//a[%s]" % has_class('entry-owner'))
+APP_ICON = xpath(".//*[%s]//*[%s]//*[%s]" % (has_class('entry-body'), has_class('media'), has_class('app-icon')))
+TIME = xpath(".//time//time")
+TITLE = xpath(".//h3//a")
+STATS = xpath(".//div[%s]//ul[%s]//*[%s]" % (has_class('media-body'), has_class('list-stats'), has_class('stat')))
+KUDO_BUTTON = xpath(".//div[%s]//div[%s]//button[%s]" % (has_class('entry-footer'), has_class('media-actions'), has_class('js-add-kudo')))
+
+STAT = re.compile(r'\s*(Distance|Time|Elevation Gain)\s*(.+)\s')
+FEED_ENTRY_CLASSES = frozenset(['feed-entry', 'card'])
+
+def text(element):
+    return element.text_content().replace('\n', '')
+
+def classes(element):
+    return (element.get('class') or '').split()
+
+class CardExtractor(object):
+    '''Fills every activity field of a feed card in a single pass
+
+    stats maps a stat label (Distance, Time, Elevation Gain) to its field
+    name and converter, sport maps the app icon classes to a sport kind and
+    missing is used for the stats a card does not display.'''
+
+    def __init__(self, stats, sport, parse_datetime, missing=None):
+        self.stats = stats
+        self.sport = sport
+        self.parse_datetime = parse_datetime
+        self.missing = missing
+
+    def extract(self, tree, on_error=None):
+        for card in CARDS(tree):
+            try:
+                yield self.extract_card(card)
+            except Exception as e:
+                if on_error: on_error(e, card)
+
+    def extract_card(self, card):
+        owner = OWNER(card)
+        icon = APP_ICON(card)
+        time = TIME(card)
+        title = TITLE(card)
+
+        entry = {
+            'athlete_id': owner[0].get('href').split('/')[-1] if owner else None,
+            'athlete_name': text(owner[0]) if owner else None,
+            'kind': self.sport(classes(icon[0])) if icon else None,
+            'time': text(time[0]) if time else None,
+            'datetime': self.parse_datetime(time[0].get('datetime')) if time else None,
+            'title': text(title[0]) if title else None,
+            'id': title[0].get('href').split('/')[-1] if title else None,
+            'kudoed': len(KUDO_BUTTON(card)) == 0,
+            'feed_entry': FEED_ENTRY_CLASSES <= set(classes(card)),
+            'rank': card.get('data-rank'),
+            'updated_at': card.get('data-updated-at'),
+        }
+        found = set()
+        for stat in STATS(card):
+            m = STAT.search(stat.text_content())
+            if m and m.group(1) not in found:
+                found.add(m.group(1))
+                (field, formatter) = self.stats[m.group(1)]
+                entry[field] = formatter(m.group(2))
+
+        for label, (field, formatter) in self.stats.items():
+            if label not in found:
+                entry[field] = self.missing
+        return entry
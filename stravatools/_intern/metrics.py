@@ -0,0 +1,87 @@
+import collections, contextlib, json, threading, time
+
+class Metrics(object):
+    '''Timings of every scraper request and of the work done on its response
+
+    Each request goes through phases: throttle (wait for the rate limit),
+    fetch (latency and bytes received), parse, extract, stream (parse and
+    extract of a streamed page), cache (page served from the response
+    cache) and store. Totals per phase are kept in memory; with path, every
+    measure is also appended to that file as a JSON line.'''
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = None
+        self.sequence = 0
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.bytes = 0
+            self.activities = 0
+            self.phases = collections.OrderedDict()
+
+    def request(self, method, url):
+        '''Metrics of a request, only counted in requests once it is sent:
+        a page served from the cache is not one'''
+        with self.lock:
+            self.sequence += 1
+            return RequestMetrics(self, self.sequence, method, url)
+
+    def sent(self):
+        with self.lock:
+            self.requests += 1
+
+    def record(self, request, phase, seconds, fields):
+        with self.lock:
+            (count, total, longest) = self.phases.get(phase, (0, 0.0, 0.0))
+            self.phases[phase] = (count + 1, total + seconds, max(longest, seconds))
+            self.bytes += fields.get('bytes') or 0
+            if phase == 'extract' or phase == 'stream':
+                self.activities += fields.get('activities') or 0
+            if self.path:
+                self.__write(dict(fields,
+                    time=time.time(), request=request.id, method=request.method,
+                    url=request.url, phase=phase, seconds=seconds))
+
+    def __write(self, line):
+        if self.file is None:
+            self.file = open(str(self.path), 'a')
+        self.file.write(json.dumps(line) + '\n')
+        self.file.flush()
+
+    def summary(self):
+        '''(phase, count, total seconds, mean seconds, max seconds) of every phase'''
+        with self.lock:
+            return [ (phase, count, total, total / count, longest)
+                for phase, (count, total, longest) in self.phases.items() ]
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
+
+class RequestMetrics(object):
+    def __init__(self, metrics, id, method, url):
+        self.metrics = metrics
+        self.id = id
+        self.method = method
+        self.url = url
+
+    def sent(self):
+        if self.metrics:
+            self.metrics.sent()
+
+    @contextlib.contextmanager
+    def measure(self, phase, **fields):
+        '''Times the enclosed block; the yielded fields can be completed inside it'''
+        start = time.perf_counter()
+        yield fields
+        if self.metrics:
+            self.metrics.record(self, phase, time.perf_counter() - start, fields)
+
+# Used for work that is not related to any request, like loading a saved page
+NO_METRICS = RequestMetrics(None, None, None, None)
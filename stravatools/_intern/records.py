@@ -0,0 +1,51 @@
+# Conversions between activity records and flat rows
+#
+# Records are the dicts extracted from feed cards, with units for the
+# stats. Rows are tuples of FIELDS with the stats as plain numbers (metres,
+# seconds): they are what the database, the export and the bulk import
+# workers handle.
+
+from datetime import datetime
+from stravatools._intern.units import *
+
+FIELDS = ('id', 'athlete_id', 'athlete_name', 'datetime', 'title', 'kind', 'distance', 'duration', 'elevation', 'kudoed')
+UNITS = (('distance', Distance), ('duration', Duration), ('elevation', Elevation))
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+EPOCH = datetime(1970, 1, 1)
+
+def raw_value(value):
+    '''Number of a unit, other values as they are'''
+    return value.value if isinstance(value, Unit) else value
+
+def to_unit(cls, value):
+    return cls(value) if value is not None else UNIT_EMPTY
+
+def format_datetime(value):
+    return value.strftime(DATETIME_FORMAT) if value else None
+
+def parse_datetime(text):
+    return datetime.strptime(text, DATETIME_FORMAT) if text else None
+
+def to_row(record):
+    return tuple(raw_value(record.get(field)) for field in FIELDS)
+
+def to_record(row):
+    record = dict(zip(FIELDS, row))
+    for (field, cls) in UNITS:
+        record[field] = to_unit(cls, record[field])
+    return record
+
+def activity_row(activity):
+    return (
+        activity.id,
+        activity.athlete.id,
+        activity.athlete.name,
+        activity.datetime,
+        activity.title,
+        activity.sport.name,
+        activity.distance_m,
+        activity.duration_s,
+        activity.elevation_m,
+        activity.kudoed,
+    )
@@ -0,0 +1,79 @@
+# Parsers of the stat strings displayed on activity cards
+#
+# Feeds repeat the same strings ("5.00 km", "1h 00m") a lot, so parsed
+# units are memoized and shared between activities: they must never be
+# mutated.
+
+import functools, re
+
+from stravatools._intern.units import *
+
+CACHE_SIZE = 4096
+
+LENGTH = re.compile(r'\s*(.*?\d.*?)\s*(km|mi|m|ft)\b')
+DURATION_PART = re.compile(r'(\d+)\s*([hms])')
+GROUPING = re.compile(r"[\s\u00a0\u202f'\u2019]")
+
+METRES = {'km': 1000.0, 'm': 1.0, 'mi': 1609.344, 'ft': 0.3048}
+SECONDS = {'h': 60 * 60, 'm': 60, 's': 1}
+
+# The first sport whose key is found in a class of the app icon wins
+SPORT_CLASSES = (
+    ('run', 'Run'),
+    ('ride', 'Bike'),
+    ('ski', 'Ski'),
+    ('swim', 'Swim'),
+)
+DEFAULT_SPORT = 'Sport'
+
+def parse_number(value):
+    '''Reads a number whatever its thousand and decimal separators:
+    1,234.5 / 1.234,5 / 1 234,5 / 1'234.5 / 1,234 / 1.234 / 5,2 / 5.25
+
+    A lone separator followed by exactly three digits is taken for a
+    thousand one, stats never show three decimals.'''
+    value = GROUPING.sub('', value)
+    (comma, dot) = (value.rfind(','), value.rfind('.'))
+    if comma >= 0 and dot >= 0:
+        (decimal, grouping) = (',', '.') if comma > dot else ('.', ',')
+        value = value.replace(grouping, '').replace(decimal, '.')
+    elif comma >= 0:
+        # A single comma not followed by a group of three digits is a decimal one
+        if value.count(',') == 1 and len(value) - comma - 1 != 3:
+            value = value.replace(',', '.')
+        else:
+            value = value.replace(',', '')
+    elif dot >= 0:
+        # Likewise a single dot followed by a group of three digits is a grouping one
+        if value.count('.') > 1 or len(value) - dot - 1 == 3:
+            value = value.replace('.', '')
+    return float(value)
+
+def to_metres(value):
+    m = LENGTH.search(value)
+    if m:
+        return parse_number(m.group(1)) * METRES[m.group(2)]
+    return None
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_distance(value):
+    metres = to_metres(value)
+    return Distance(metres) if metres is not None else UNIT_EMPTY
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_elevation(value):
+    metres = to_metres(value)
+    return Elevation(metres) if metres is not None else UNIT_EMPTY
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def to_duration(value):
+    parts = DURATION_PART.findall(value)
+    if parts:
+        return Duration(sum(int(amount) * SECONDS[unit] for (amount, unit) in parts))
+    return UNIT_EMPTY
+
+def to_sport(classes):
+    for (key, sport) in SPORT_CLASSES:
+        for cls in classes:
+            if key in cls: return sport
+    return DEFAULT_SPORT
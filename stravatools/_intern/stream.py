@@ -0,0 +1,88 @@
+import lxml.etree, lxml.html
+
+from stravatools._intern.document import feed_params
+from stravatools._intern.extract import classes
+from stravatools._intern.metrics import NO_METRICS
+
+def is_card(element):
+    return 'activity' in classes(element)
+
+def is_nested(element):
+    return any(map(is_card, element.iterancestors('div')))
+
+class StreamDocument(object):
+    '''Feed page parsed incrementally while its body downloads
+
+    Activity records are yielded as soon as their card is complete, then
+    the card is cleared so the tree never holds more than one of them. The
+    records can only be read once and the response is released afterwards.
+    inspect receives every chunk (with the tail of the previous one) and
+    on_done the feed cursor once the page is consumed.'''
+
+    text = None
+    tree = None
+    OVERLAP = 512
+
+    def __init__(self, response, inspect=None, on_done=None, chunk_size=16*1024, metrics=NO_METRICS):
+        self.response = response
+        self.metrics = metrics
+        self.inspect = inspect
+        self.on_done = on_done
+        self.chunk_size = chunk_size
+        self.cursor = None
+        self.__consumed = False
+
+    def records(self, extractor, on_error=None):
+        if self.__consumed:
+            return iter([])
+        self.__consumed = True
+        return self.__stream(extractor, on_error)
+
+    def feed_cursor(self):
+        return self.cursor
+
+    def csrf_token(self):
+        return None
+
+    def __stream(self, extractor, on_error):
+        parser = lxml.etree.HTMLPullParser(events=('end',), tag='div', encoding=self.response.encoding)
+        parser.set_element_class_lookup(lxml.html.HtmlElementClassLookup())
+        entries = []
+        tail = b''
+        # Timed from the first to the last chunk, including the time readers spend on each record
+        with self.metrics.measure('stream', bytes=0) as fields:
+            try:
+                for chunk in self.response.iter_content(self.chunk_size):
+                    fields['bytes'] += len(chunk)
+                    if self.inspect:
+                        window = tail + chunk
+                        self.inspect(window)
+                        tail = window[-StreamDocument.OVERLAP:]
+                    parser.feed(chunk)
+                    for record in self.__cards(parser, extractor, on_error, entries):
+                        yield record
+                parser.close()
+                for record in self.__cards(parser, extractor, on_error, entries):
+                    yield record
+            finally:
+                self.response.close()
+                self.response = None
+                fields['activities'] = len(entries)
+
+        self.cursor = feed_params(entries)
+        if self.on_done: self.on_done(self.cursor)
+
+    def __cards(self, parser, extractor, on_error, entries):
+        for (event, element) in parser.read_events():
+            if not is_card(element):
+                continue
+            try:
+                record = extractor.extract_card(element)
+                entries.append({ key: record[key] for key in ('feed_entry', 'datetime', 'rank', 'updated_at') })
+                yield record
+            except Exception as e:
+                if on_error: on_error(e, element)
+            if not is_nested(element):
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
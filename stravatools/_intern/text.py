@@ -0,0 +1,69 @@
+# Full-text search over activity titles and athlete names
+#
+# Text is folded (accents removed, case folded) then split into words, so
+# "Sortie à vélo dans l'après-midi" is found by "velo apres". Feeds repeat
+# the same titles a lot, so tokenized texts are memoized.
+
+import array, bisect, functools, re, unicodedata
+
+CACHE_SIZE = 4096
+
+WORD = re.compile(r'\w+')
+
+def fold(text):
+    '''Lower case text without accents'''
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def tokens(text):
+    return tuple(WORD.findall(fold(text))) if text else ()
+
+def terms(query):
+    '''Folded words of a search query'''
+    return tokens(query)
+
+def matches(words, query_terms):
+    '''Whether every query term is the prefix of one of the words'''
+    return all(any(word.startswith(term) for word in words) for term in query_terms)
+
+class TextIndex(object):
+    '''Inverted index of words to the sequence numbers of the documents
+    containing them
+
+    Documents are added with increasing sequence numbers, so postings stay
+    sorted. The vocabulary is kept sorted for prefix lookups.'''
+
+    def __init__(self):
+        self.__postings = {}
+        self.__words = []
+
+    def add(self, seq, *texts):
+        for word in set(word for text in texts for word in tokens(text)):
+            postings = self.__postings.get(word)
+            if postings is None:
+                postings = self.__postings[word] = array.array('L')
+                bisect.insort(self.__words, word)
+            postings.append(seq)
+
+    def expand(self, term):
+        '''Words of the vocabulary starting with term'''
+        i = bisect.bisect_left(self.__words, term)
+        while i < len(self.__words) and self.__words[i].startswith(term):
+            yield self.__words[i]
+            i += 1
+
+    def count(self, term):
+        '''Upper bound of the documents matching a term'''
+        return sum(len(self.__postings[word]) for word in self.expand(term))
+
+    def candidates(self, query_terms):
+        '''(count, sequence numbers) of the documents matching the most
+        selective term; they still have to be checked against the others'''
+        if len(query_terms) == 0:
+            return (0, [])
+        (count, term) = min((self.count(term), term) for term in query_terms)
+        words = list(self.expand(term))
+        if len(words) == 1:
+            return (count, self.__postings[words[0]])
+        return (count, sorted(set(seq for word in words for seq in self.__postings[word])))
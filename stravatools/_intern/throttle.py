@@ -0,0 +1,117 @@
+import collections, datetime, email.utils, threading, time
+
+class TokenBucket(object):
+    '''Rate limit shared by threads: rate requests per second on average,
+    with bursts of up to burst requests
+
+    Each request takes a token, possibly one that is only refilled later,
+    and waits until then: requests are served in the order they asked.'''
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''Waits for a token and returns the seconds waited'''
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+# Answers of an overloaded server, the request is sent again later
+THROTTLED_STATUSES = (429, 503)
+
+def retry_after(value):
+    '''Seconds of a Retry-After header, given in seconds or as a date'''
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if date is None:
+        return None
+    return max(0.0, (date - datetime.datetime.now(date.tzinfo or datetime.timezone.utc)).total_seconds())
+
+class AdaptiveThrottle(TokenBucket):
+    '''Token bucket whose rate follows what the server can take (AIMD)
+
+    Without a rate, requests are not limited until the server throttles one
+    of them: the rate then starts from the one observed on the last
+    requests. It is multiplied by decrease (at most once a second) on every
+    throttled or slow response, and grows by increase requests per second
+    after every other one, up to max_rate (no maximum by default) and never
+    below min_rate. A Retry-After holds every request until it is over.'''
+
+    # Requests the rate observed before the first throttling is measured on
+    OBSERVED = 64
+
+    def __init__(self, rate=None, burst=10, min_rate=0.2, increase=0.1, decrease=0.5, slow=5.0, max_rate=None):
+        TokenBucket.__init__(self, rate or min_rate, burst)
+        self.limited = rate is not None
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, self.rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.slow = slow
+        self.decreased = 0.0
+        self.paused_until = 0.0
+        self.sent = collections.deque(maxlen=AdaptiveThrottle.OBSERVED)
+
+    def acquire(self):
+        with self.lock:
+            now = time.monotonic()
+            pause = self.paused_until - now
+            limited = self.limited
+            if not limited:
+                self.sent.append(now + max(0.0, pause))
+        if pause > 0:
+            time.sleep(pause)
+        return max(0.0, pause) + (TokenBucket.acquire(self) if limited else 0.0)
+
+    def throttled(self, retry_after=None):
+        '''The server answered 429 / 503, optionally with a Retry-After'''
+        with self.lock:
+            now = time.monotonic()
+            self.__decrease(now)
+            # No burst once the server asked to slow down
+            self.tokens = min(self.tokens, 0.0)
+            if retry_after:
+                self.paused_until = max(self.paused_until, now + retry_after)
+
+    def succeeded(self, latency):
+        '''The server answered within latency seconds'''
+        with self.lock:
+            if latency > self.slow:
+                self.__decrease(time.monotonic())
+            elif self.limited:
+                self.rate += self.increase
+                if self.max_rate: self.rate = min(self.max_rate, self.rate)
+
+    def __decrease(self, now):
+        if not self.limited:
+            # Limited from now on, starting from the rate requests were sent at
+            self.limited = True
+            self.rate = self.__observed(now)
+            self.tokens = 0.0
+            self.updated = now
+        if now - self.decreased >= 1.0:
+            self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.decreased = now
+
+    def __observed(self, now):
+        if len(self.sent) < 2:
+            return self.burst
+        return len(self.sent) / max(0.5, now - self.sent[0])
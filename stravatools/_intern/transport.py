@@ -0,0 +1,93 @@
+from stravatools._intern.throttle import AdaptiveThrottle
+
+# requests and urllib3 are only imported once a session is built, they are
+# slow to import and not needed by shell commands working offline
+
+def brotli_supported():
+    for module in ('brotli', 'brotlicffi'):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            pass
+    return False
+
+class Transport(object):
+    '''Connection pool, keep-alive, retry and compression settings of the
+    HTTP session shared by every scraper request
+
+    With record, every exchange is also saved to that capture directory.
+    With replay, responses are served from a capture directory and the
+    network is never used. Every request of every session built by this
+    transport waits for a token of throttle (by default an AdaptiveThrottle
+    starting from rate requests per second, or unlimited until the server
+    throttles, and growing up to max_rate; none when replaying).
+
+    503 is left out of the urllib3 retries: like 429, it is retried by the
+    scraper through the throttle, which slows down for every session.'''
+
+    RETRY_STATUSES = (500, 502, 504)
+    # POST (login, kudo) is not idempotent: it is only retried on connection
+    # errors, when the request was never sent
+    RETRY_METHODS = frozenset(['GET'])
+
+    def __init__(self, pool_size=10, retries=3, backoff=0.5, keep_alive=True, record=None, replay=None, throttle=None, rate=None, max_rate=None):
+        self.pool_size = max(1, pool_size)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.keep_alive = keep_alive
+        self.record = record
+        self.replay = replay
+        if throttle is None and not replay:
+            throttle = AdaptiveThrottle(rate, burst=rate or 10, max_rate=max_rate)
+        self.throttle = throttle
+
+    def headers(self):
+        encodings = ['gzip', 'deflate']
+        if brotli_supported(): encodings.append('br')
+        return {
+            'Accept-Encoding': ', '.join(encodings),
+            'Connection': 'keep-alive' if self.keep_alive else 'close',
+        }
+
+    def retry(self):
+        from urllib3.util.retry import Retry
+        options = {
+            'total': self.retries,
+            'backoff_factor': self.backoff,
+            'status_forcelist': self.RETRY_STATUSES,
+            'raise_on_status': False,
+            # 429 / 503 with a Retry-After are left to the throttle
+            'respect_retry_after_header': False,
+        }
+        try:
+            return Retry(allowed_methods=self.RETRY_METHODS, **options)
+        except TypeError:
+            # urllib3 < 1.26
+            return Retry(method_whitelist=self.RETRY_METHODS, **options)
+
+    def adapter(self):
+        from requests.adapters import HTTPAdapter
+        from stravatools._intern.capture import Capture, RecordingAdapter, ReplayAdapter
+        if self.replay:
+            return ReplayAdapter(Capture(self.replay))
+        options = {
+            'pool_connections': self.pool_size,
+            'pool_maxsize': self.pool_size,
+            'max_retries': self.retry(),
+        }
+        if self.record:
+            return RecordingAdapter(Capture(self.record), **options)
+        return HTTPAdapter(**options)
+
+    def session(self, cookies, headers={}, cert=None):
+        import requests
+        session = requests.Session()
+        adapter = self.adapter()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers())
+        session.headers.update(headers)
+        if cert: session.verify = cert
+        session.cookies = cookies
+        return session
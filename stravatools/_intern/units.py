@@ -1,6 +1,8 @@
 import time
 
 class Unit(object):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         self.value = value
 
@@ -10,6 +12,8 @@ class Unit(object):
 UNIT_EMPTY = Unit(None)
 
 class Distance(Unit):
+    __slots__ = ()
+
     def for_human(self):
         if not self.value:
             return ''
@@ -25,12 +29,16 @@ class Distance(Unit):
 
 
 class Elevation(Distance):
+    __slots__ = ()
+
     def for_human(self):
         if not self.value:
             return ''
         return '%d m' % self.m()
 
 class Duration(Unit):
+    __slots__ = ()
+
     def for_human(self):
         if not self.value:
             return ''
@@ -52,6 +60,8 @@ class Duration(Unit):
         return self.value
 
 class Speed(Unit):
+    __slots__ = ('unit',)
+
     def __init__(self, duration, distance, unit):
         if UNIT_EMPTY not in (duration, distance):
             self.value = distance.m() / duration.seconds()
@@ -73,6 +83,8 @@ class Speed(Unit):
         return '%.1f %s' % (formula(), self.unit)
 
 class Pace(Unit):
+    __slots__ = ('unit',)
+
     def __init__(self, duration, distance, unit):
         if UNIT_EMPTY not in (duration, distance):
             self.value = duration.minutes() / distance.km()
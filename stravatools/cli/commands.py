@@ -2,17 +2,32 @@ import click, getpass, sys
 from click_spinner import spinner
 
 import cmd, texttables, functools, datetime
-from stravatools.scraper import NotLogged, WrongAuth
+from stravatools.client import Sport
+from stravatools.store import Query
+from stravatools.export import FORMATS
+from stravatools.cli.table import FixedWriter
 from stravatools import __version__
 from stravatools._intern.tools import *
+from stravatools._intern.units import *
+from stravatools._intern.columns import GROUP_KEYS
 
 
 @click.command()
-@click.argument('file', type=click.Path(exists=True))
+@click.argument('files', nargs=-1, required=True)
+@click.option('-w', '--workers', default=0, help='Processes parsing pages (default one per CPU)')
 @click.pass_context
-def sample(ctx, file):
-    (new, total) = ctx.obj['client'].load_page(file)
-    print('Loaded %d activities' % new)
+def sample(ctx, files, workers):
+    '''Loads activities from saved dashboard pages: files, directories
+  or glob patterns'''
+
+    with spinner():
+        result = ctx.obj['client'].load_pages(files, workers or None)
+
+    for (path, error) in result.failures:
+        print('%s: %s' % (path, error))
+    rate = lambda count: count / result.seconds if result.seconds > 0 else 0
+    print('Loaded %d activities from %d pages in %.1fs (%.0f pages/s, %.0f activities/s)' % (
+        result.new, result.pages, result.seconds, rate(result.pages), rate(len(result.records))))
 
 @click.command()
 @click.pass_context
@@ -21,6 +36,7 @@ def login(ctx):
   You will be asked to provider you username (email) and password
   and eventually store a cookie to keep your strava session open'''
     
+    from stravatools.scraper import WrongAuth
     try:
         client = ctx.obj['client']
         username = click.prompt('Username', default=client.last_username())
@@ -51,12 +67,7 @@ def load(ctx, all, next, n):
     def load():
         client = ctx.obj['client']
         if all:
-            (new, total) = client.load_activity_feed(num=100)
-            s = new
-            while new > 0:
-                (new, total) = client.load_activity_feed(next = True)
-                s = s + new
-            new = s
+            (new, total) = client.load_all_activity_feed(num=100)
         else:
             (new, total) = client.load_activity_feed(next=next, num=n)
         return new
@@ -66,61 +77,211 @@ def load(ctx, all, next, n):
 
     print('Loaded %d activities' % new)
 
+@click.command()
+@click.argument('n', default=30)
+@click.pass_context
+def sync(ctx, n):
+    '''Loads the activity feed until already stored activities are reached
+  (pages of [n] activities, default 30)'''
+
+    with spinner():
+        (new, total) = ctx.obj['client'].sync(n)
+
+    print('Loaded %d activities' % new)
+
+class RangeType(click.ParamType):
+    '''min:max range, either end can be left out, scaled to metres or seconds'''
+    name = 'range'
+
+    def __init__(self, scale=1):
+        self.scale = scale
+
+    def convert(self, value, param, ctx):
+        try:
+            (low, high) = value.split(':') if ':' in value else (value, value)
+            bound = lambda text: float(text) * self.scale if text.strip() else None
+            return (bound(low), bound(high))
+        except ValueError:
+            self.fail('%s is not a min:max range' % value, param, ctx)
+
+DATE = click.DateTime(formats=['%Y-%m-%d'])
+
+# Header, width and cell of the activities table
+ACTIVITY_COLUMNS = (
+    ('Kudo', 4, lambda a: '*' if a.dirty else u'\u2713' if a.kudoed else ''),
+    ('Time', 20, lambda a: datetime.datetime.strftime(a.datetime, '%Y-%m-%d %H:%M:%S %Z')),
+    ('Athlete', 20, lambda a: a.athlete.name),
+    ('Sport', 5, lambda a: a.sport.name),
+    ('Duration', 8, lambda a: a.duration.for_human()),
+    ('Distance', 9, lambda a: a.distance.for_human()),
+    ('Elevation', 9, lambda a: a.elevation.for_human()),
+    ('Velocity', 8, lambda a: a.velocity().for_human()),
+    ('Title', 40, lambda a: a.title),
+)
+
+def display_row(activity):
+    '''Cells of an activity, cached on it until its kudo state changes'''
+    if activity.display is None:
+        activity.display = tuple(cell(activity) for (header, width, cell) in ACTIVITY_COLUMNS)
+    return activity.display
+
 @click.command()
 @click.option('-a', '--athlete', help='Filter and display activities that pattern match the athlete name')
+@click.option('-s', '--sport', multiple=True, help='Filter activities of this sport (repeatable)')
+@click.option('--since', type=DATE, help='Filter activities from this day (YYYY-MM-DD)')
+@click.option('--until', type=DATE, help='Filter activities up to this day included (YYYY-MM-DD)')
+@click.option('--distance', type=RangeType(1000), help='Filter activities by distance in km (min:max)')
+@click.option('--duration', type=RangeType(60), help='Filter activities by duration in minutes (min:max)')
+@click.option('--elevation', type=RangeType(), help='Filter activities by elevation gain in m (min:max)')
 @click.option('-K/-k', '--kudoed/--no-kudoed', is_flag=True, default=None, help='Filter and display activities you haven''t sent a kudo')
+@click.option('-t', '--title', help='Filter activities whose title or athlete name contain words starting with these ones')
+@click.option('-l', '--limit', default=0, help='Only display the n most recent selected activities (default 0, all)')
+@click.option('-o', '--offset', default=0, help='Skip the n most recent selected activities in the display')
 @click.pass_context
-def activities(ctx, athlete, kudoed):
+def activities(ctx, athlete, sport, since, until, distance, duration, elevation, kudoed, title, limit, offset):
     '''Dispaly loaded activity and filters are used to select activities
-  <pattern> [-]<string> ('-' negate)'''
+  <pattern> [-]<string> ('-' negate)
+  Paging with --limit and --offset only applies to the display, kudo still
+  goes to every selected activity'''
+
+    until = until + datetime.timedelta(days=1) if until else None
+    client = ctx.obj['client']
+    client.select_activities(Query(athlete, sport, since, until, distance, duration, elevation, kudoed, title))
+
+    selected = client.selected_activities
+    end = offset + limit if limit > 0 else len(selected)
+    # Newest first in the selection, displayed oldest first
+    page = selected[offset:end][::-1]
+    if len(page) < len(selected):
+        print('Activities %d-%d of %d/%d' % (offset + 1, offset + len(page), len(selected), len(client.activities)))
+    else:
+        print('Activities %d/%d' % (len(selected), len(client.activities)))
+    if len(page) > 0:
+        # Fixed widths: rows are printed as soon as they are formatted
+        w = FixedWriter(sys.stdout, [ width for (header, width, cell) in ACTIVITY_COLUMNS ])
+        w.writeheader([ header for (header, width, cell) in ACTIVITY_COLUMNS ])
+        for activity in page:
+            w.writerow(display_row(activity))
+
+@click.command()
+@click.argument('words', nargs=-1, required=True)
+@click.pass_context
+def search(ctx, words):
+    '''Display activities whose title or athlete name contain words starting
+  with the given ones, accents and case aside'''
+
+    ctx.invoke(activities, title=' '.join(words))
+
+@click.command()
+@click.option('-c', '--concurrency', default=1, help='Number of kudos sent in parallel (default 1)')
+@click.option('-r', '--resume', is_flag=True, help='Send the kudos left unsent by an interrupted or failed kudo')
+@click.pass_context
+def kudo(ctx, concurrency, resume):
+    '''Send kudo to all filtered activities'''
+
+    client = ctx.obj['client']
+    if resume:
+        print('Resuming %d kudos' % len(client.outbox.pending()))
+        for (intent, sent) in client.resume_kudos(concurrency):
+            print('Kudoing %s for %s .. %s' % (intent['athlete'], intent['title'], 'Ok' if sent else 'Failed'))
+    else:
+        activities = filter(filter_kudo(False), client.selected_activities)
+        for (activity, sent) in client.send_kudos(activities, concurrency):
+            print('Kudoing %s for %s .. %s' % (activity.athlete.name, activity.title, 'Ok' if sent else 'Failed'))
+    pending = len(client.outbox.pending())
+    if pending > 0:
+        print('%d kudos not sent, retry them with kudo --resume' % pending)
+
+@click.command()
+@click.option('-b', '--by', type=click.Choice(GROUP_KEYS), multiple=True, help='Group totals by athlete, sport, week or month (repeatable)')
+@click.option('-s', '--selected', is_flag=True, help='Only summarize the activities selected by the last activities command')
+@click.pass_context
+def summary(ctx, by, selected):
+    '''Display totals of distance, time and elevation with mean speed and pace
+  of loaded activities'''
 
     class dialect(texttables.Dialect):
         header_delimiter = '-'
 
-    predicate = [ func(param) for param, func in [
-        (athlete, filter_athlete),
-        (kudoed, filter_kudo)
-    ] if param != None ]
+    try:
+        columns = ctx.obj['client'].columns(selected)
+    except ImportError:
+        print('summary requires numpy: pip install strava-tools[stats]')
+        return
 
-    client = ctx.obj['client']
-    client.select_activities(all_predicates(predicate))
-
-    print('Activities %d/%d' % (len(client.selected_activities), len(client.activities)))
-    if len(client.selected_activities) > 0:
-        mapper = {
-            'Kudo': lambda a: '*' if a.dirty else u'\u2713' if a.kudoed else '',
-            'Time': lambda a: datetime.datetime.strftime(a.datetime, '%Y-%m-%d %H:%M:%S %Z'),
-            'Athlete': lambda a: a.athlete.name,
-            'Sport': lambda a: a.sport.name,
-            'Duration': lambda a: a.sport.duration.for_human(),
-            'Distance': lambda a: a.sport.distance.for_human(),
-            'Elevation': lambda a: a.sport.elevation.for_human(),
-            'Velocity': lambda a: a.sport.velocity().for_human(),
-            'Title': lambda a: a.title,
-        }
-        make_entry = lambda activity: [ (header, mapper(activity)) for header,mapper in mapper.items() ]
-        data = list(map(dict, map(make_entry, client.selected_activities[::-1])))
-        with texttables.dynamic.DictWriter(sys.stdout, list(mapper.keys()), dialect=dialect) as w:
+    headers = [ key.capitalize() for key in by ] + ['Count', 'Distance', 'Duration', 'Elevation', 'Speed', 'Pace']
+    rows = []
+    for (labels, count, metres, seconds, elevation, speed) in columns.summarize(by):
+        moving = speed == speed and speed > 0
+        # Paces in the unit of the activities table when rows are per sport
+        pace = Sport.of({'kind': labels[by.index('sport')]}).pace if 'sport' in by else Sport.pace
+        values = list(labels) + [
+            '%d' % count,
+            Distance(metres).for_human(),
+            total_duration(seconds),
+            Elevation(elevation).for_human(),
+            '%.1f kmh' % (speed * 3.6) if moving else '',
+            Pace(Duration(1000 / speed), Distance(1000), pace).for_human() if moving else '',
+        ]
+        rows.append(dict(zip(headers, values)))
+
+    print('Activities %d' % columns.size)
+    if len(rows) > 0:
+        with texttables.dynamic.DictWriter(sys.stdout, headers, dialect=dialect) as w:
             w.writeheader()
-            w.writerows(data)
+            w.writerows(rows)
+
+@click.command()
+@click.argument('file', type=click.Path(dir_okay=False))
+@click.option('-f', '--format', type=click.Choice(FORMATS), help='csv, jsonl or parquet (default from the file extension)')
+@click.option('-s', '--selected', is_flag=True, help='Only export the activities selected by the last activities command')
+@click.pass_context
+def export(ctx, file, format, selected):
+    '''Write loaded activities to a csv, jsonl or parquet file, with distances
+  and elevations in metres and durations in seconds'''
 
+    try:
+        count = ctx.obj['client'].export(file, format, selected)
+    except ValueError as e:
+        print(e)
+        return
+    except ImportError:
+        print('parquet export requires pyarrow: pip install strava-tools[parquet]')
+        return
+    print('Exported %d activities to %s' % (count, file))
 
 @click.command()
+@click.option('--reset', is_flag=True, help='Clear the collected timings')
 @click.pass_context
-def kudo(ctx):
-    '''Send kudo to all filtered activities'''
+def stats(ctx, reset):
+    '''Display time spent per phase (fetch, parse, extract, store...)
+  of the requests made since startup'''
 
-    for activity in filter(filter_kudo(False), ctx.obj['client'].selected_activities):
-        print('Kudoing %s for %s .. ' % (activity.athlete.name, activity.title), end='')
-        if activity.send_kudo(): print('Ok')
-        else: print('Failed')
+    class dialect(texttables.Dialect):
+        header_delimiter = '-'
+
+    metrics = ctx.obj['client'].metrics
+    print('Requests %d, %.1f kB received, %d activities extracted' % (metrics.requests, metrics.bytes / 1024.0, metrics.activities))
+    summary = metrics.summary()
+    if len(summary) > 0:
+        headers = ['Phase', 'Count', 'Total', 'Mean', 'Max']
+        rows = [ dict(zip(headers, (phase, '%d' % count, '%.3f s' % total, '%.1f ms' % (mean * 1000), '%.1f ms' % (longest * 1000))))
+            for (phase, count, total, mean, longest) in summary ]
+        with texttables.dynamic.DictWriter(sys.stdout, headers, dialect=dialect) as w:
+            w.writeheader()
+            w.writerows(rows)
+    if reset:
+        metrics.reset()
 
 
 def greeting(client):
     if client.get_owner():
         click.secho('Welcome %s' % client.get_owner().name)
 
-def filter_athlete(param):
-    return lambda activity: contains(param, activity.athlete.name)
+def total_duration(seconds):
+    if not seconds:
+        return ''
+    return '%dh %02dm' % (seconds // 3600, seconds % 3600 // 60)
+
 def filter_kudo(sent):
     return lambda activity: eq_bool(sent, activity.kudoed)
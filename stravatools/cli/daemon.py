@@ -0,0 +1,102 @@
+import click, datetime, signal, sys, threading
+from stravatools import __version__
+from stravatools.client import Client
+from stravatools.store import ActivityStore, Query
+from stravatools._intern.transport import Transport
+from stravatools.cli.commands import RangeType
+
+class PollInterval(object):
+    '''Seconds to wait before the next poll of the feed: back to minimum as
+    soon as new activities show up, multiplied by factor up to maximum
+    while the feed stays idle'''
+
+    def __init__(self, minimum=60, maximum=900, factor=2.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.factor = max(1.0, factor)
+        self.seconds = self.minimum
+
+    def next(self, new):
+        if new > 0:
+            self.seconds = self.minimum
+        else:
+            self.seconds = min(self.maximum, self.seconds * self.factor)
+        return self.seconds
+
+def log(message):
+    click.echo('%s %s' % (datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'), message))
+
+def poll(client, num):
+    '''Loads the activities newer than the newest stored one and returns them
+
+    With nothing stored yet, only the top of the feed is loaded.'''
+    count = len(client.activities)
+    if count == 0:
+        client.load_activity_feed(num=num)
+    else:
+        client.sync(num)
+    return client.activities.added(count)
+
+def kudo(client, activities, rule, concurrency):
+    '''Sends kudos to the new activities matching the rule'''
+    selected = ActivityStore(activities).select(rule)
+    sent = 0
+    for (activity, ok) in client.send_kudos(selected, concurrency):
+        log('Kudoing %s for %s .. %s' % (activity.athlete.name, activity.title, 'Ok' if ok else 'Failed'))
+        sent += 1 if ok else 0
+    return sent
+
+@click.command()
+@click.option('--cert', help='Path SSL certificat Root CA')
+@click.option('-v', '--verbose', count=True)
+@click.option('-n', '--num', default=30, help='Activities per feed page (default 30)')
+@click.option('--min-interval', default=60, help='Seconds between polls while new activities show up (default 60)')
+@click.option('--max-interval', default=900, help='Longest wait between polls of an idle feed (default 900)')
+@click.option('--backoff', default=2.0, help='Factor applied to the wait after each idle poll (default 2)')
+@click.option('--persist', is_flag=True, help='Keep activities in the local database between runs')
+@click.option('--metrics', type=click.Path(dir_okay=False), help='Append per request timings to this JSON lines file')
+@click.option('--kudo/--no-kudo', 'auto_kudo', default=False, help='Send kudos to new activities matching the rules below')
+@click.option('-a', '--athlete', help='Kudo rule: athlete name pattern, [-]<string> (\'-\' negate)')
+@click.option('-s', '--sport', multiple=True, help='Kudo rule: sport (repeatable)')
+@click.option('--distance', type=RangeType(1000), help='Kudo rule: distance in km (min:max)')
+@click.option('--duration', type=RangeType(60), help='Kudo rule: duration in minutes (min:max)')
+@click.option('--elevation', type=RangeType(), help='Kudo rule: elevation gain in m (min:max)')
+@click.option('-t', '--title', help='Kudo rule: words starting words of the title or athlete name')
+@click.option('-c', '--concurrency', default=1, help='Number of kudos sent in parallel (default 1)')
+@click.option('--config', type=click.Path(file_okay=False), help='Config directory of the account (default ~/.strava-tools)')
+def main(config, cert, verbose, num, min_interval, max_interval, backoff, persist, metrics, auto_kudo, athlete, sport, distance, duration, elevation, title, concurrency):
+    '''Polls the activity feed of the session opened with strava-shell login
+  and sends kudos to new activities matching the rules'''
+
+    from stravatools.scraper import NotLogged
+    client = Client(config, cert=cert, debug=verbose, transport=Transport(), metrics_path=metrics, persist=persist)
+    rule = Query(athlete, sport, None, None, distance, duration, elevation, False, title)
+    interval = PollInterval(min_interval, max_interval, backoff)
+    stopped = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopped.set())
+
+    log('Strava daemon %s, %d activities known' % (__version__, len(client.activities)))
+    status = 0
+    try:
+        while not stopped.is_set():
+            try:
+                new = poll(client, num)
+                sent = kudo(client, new, rule, concurrency) if auto_kudo else 0
+                log('%d new activities, %d kudos sent, %d known' % (len(new), sent, len(client.activities)))
+            except NotLogged:
+                log('Not logged in, open a session with strava-shell login')
+                status = 1
+                break
+            except Exception as e:
+                log('Poll failed: %s' % e)
+                new = []
+            stopped.wait(interval.next(len(new)))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        log('Stopped')
+    sys.exit(status)
+
+if __name__ == '__main__':
+    main()
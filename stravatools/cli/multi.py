@@ -0,0 +1,84 @@
+import click, pathlib, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from stravatools.client import Client
+from stravatools.store import ActivityStore, Query
+from stravatools._intern.throttle import AdaptiveThrottle
+from stravatools._intern.transport import Transport
+
+ACTIONS = ('load', 'all', 'sync', 'kudo')
+
+class Output(object):
+    '''Lines of every account printed whole, prefixed with the account name'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.width = 0
+
+    def line(self, account, message):
+        with self.lock:
+            click.echo('%-*s | %s' % (self.width, account, message))
+
+def run_account(path, actions, num, concurrency, options, output):
+    '''Runs the actions with the client of one account and returns
+    (new activities, kudos sent)'''
+    from stravatools.scraper import NotLogged
+    account = path.name
+    client = Client(path, **options)
+    (loaded, sent) = (0, 0)
+    try:
+        before = len(client.activities)
+        for action in actions:
+            start = time.perf_counter()
+            if action == 'load':
+                (new, total) = client.load_activity_feed(num=num)
+            elif action == 'all':
+                (new, total) = client.load_all_activity_feed(num=100)
+            elif action == 'sync':
+                (new, total) = client.sync(num)
+            elif action == 'kudo':
+                # Kudos go to the activities loaded by this run only
+                selected = ActivityStore(client.activities.added(before)).select(Query(kudoed=False))
+                results = list(client.send_kudos(selected, concurrency))
+                new = sum(1 for (activity, ok) in results if ok)
+                sent += new
+                output.line(account, 'kudo: %d/%d sent in %.1fs' % (new, len(results), time.perf_counter() - start))
+                continue
+            loaded += new
+            output.line(account, '%s: %d new activities, %d stored in %.1fs' % (action, new, total, time.perf_counter() - start))
+    except NotLogged:
+        output.line(account, 'Not logged in, open a session with strava-shell --config %s login' % path)
+    except Exception as e:
+        output.line(account, 'Failed: %s' % e)
+    finally:
+        client.close()
+    return (loaded, sent)
+
+@click.command()
+@click.argument('configs', nargs=-1, required=True, type=click.Path(exists=True, file_okay=False))
+@click.option('-a', '--action', type=click.Choice(ACTIONS), multiple=True, help='load (n activities), all (whole feed), sync or kudo, run in the given order for every account (default sync)')
+@click.option('-n', '--num', default=30, help='Activities per feed page (default 30)')
+@click.option('-w', '--workers', default=0, help='Accounts run in parallel (default all)')
+@click.option('--rate', default=5.0, help='Maximum requests per second shared by all accounts, lowered while the server throttles (default 5)')
+@click.option('--burst', default=5, help='Requests allowed at once above the rate (default 5)')
+@click.option('-c', '--concurrency', default=1, help='Kudos sent in parallel per account (default 1)')
+@click.option('--cert', help='Path SSL certificat Root CA')
+@click.option('--persist', is_flag=True, help='Keep activities of every account in its local database')
+def main(configs, action, num, workers, rate, burst, concurrency, cert, persist):
+    '''Runs load / sync / kudo for several accounts at once, one config
+  directory per account (see strava-shell --config), under one rate limit'''
+
+    paths = [ pathlib.Path(config) for config in configs ]
+    transport = Transport(throttle=AdaptiveThrottle(rate, burst, max_rate=rate))
+    options = {'cert': cert, 'transport': transport, 'persist': persist}
+    output = Output()
+    output.width = max(len(path.name) for path in paths)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers if workers > 0 else len(paths)) as executor:
+        futures = [ executor.submit(run_account, path, action or ('sync',), num, concurrency, options, output) for path in paths ]
+        results = [ future.result() for future in futures ]
+    click.echo('%d accounts, %d new activities, %d kudos sent in %.1fs' % (
+        len(paths), sum(loaded for (loaded, sent) in results), sum(sent for (loaded, sent) in results), time.perf_counter() - start))
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,8 @@
 
-import click, os
+import click, os, pathlib
 from stravatools import __version__
 from stravatools.client import Client
+from stravatools._intern.transport import Transport
 from stravatools.cli import commands
 # If Pull Request accepted: from click_shell import shell
 from stravatools.cli.click_shell_plus import shell
@@ -27,8 +28,25 @@ for command in commands.__dict__.values():
 @click.command()
 @click.option('--cert', help='Path SSL certificat Root CA')
 @click.option('-v', '--verbose', count=True)
-def main(cert, verbose):
-    cli_shell(obj = {'client': Client(cert=cert, debug=verbose)})
+@click.option('--pool-size', default=10, help='Number of pooled HTTP connections (default 10)')
+@click.option('--retries', default=3, help='Retries on connection errors and server errors (default 3)')
+@click.option('--backoff', default=0.5, help='Backoff factor in seconds between retries (default 0.5)')
+@click.option('--keep-alive/--no-keep-alive', default=True, help='Reuse HTTP connections between requests')
+@click.option('--rate', type=float, help='Requests per second to start from (default no limit until the server throttles)')
+@click.option('--max-rate', type=float, help='Highest requests per second the rate grows to (default no maximum)')
+@click.option('--cache-ttl', default=0, help='Seconds feed pages are served from the on-disk cache (default 0, no cache)')
+@click.option('--cache-size', default=50, help='Maximum size of the on-disk cache in MB (default 50)')
+@click.option('--persist', is_flag=True, help='Keep activities in a local database between sessions')
+@click.option('--stream', is_flag=True, help='Parse feed pages incrementally while they download, in bounded memory')
+@click.option('--metrics', type=click.Path(dir_okay=False), help='Append per request timings to this JSON lines file')
+@click.option('--record', type=click.Path(file_okay=False), help='Save every HTTP exchange to this capture directory')
+@click.option('--replay', type=click.Path(exists=True, file_okay=False), help='Serve HTTP responses from this capture directory, offline')
+@click.option('--config', type=click.Path(file_okay=False), help='Config directory of the account (default ~/.strava-tools)')
+def main(cert, verbose, pool_size, retries, backoff, keep_alive, rate, max_rate, cache_ttl, cache_size, persist, stream, metrics, record, replay, config):
+    as_path = lambda path: pathlib.Path(path) if path else None
+    transport = Transport(pool_size, retries, backoff, keep_alive, as_path(record), as_path(replay), rate=rate, max_rate=max_rate)
+    client = Client(config, cert=cert, debug=verbose, transport=transport, cache_ttl=cache_ttl, cache_size=cache_size*1024*1024, stream=stream, metrics_path=metrics, persist=persist)
+    cli_shell(obj = {'client': client})
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,15 @@
+class FixedWriter(object):
+    '''Table with fixed column widths, written row by row as soon as rows
+    are given: nothing is buffered to size the columns, longer cells are
+    cut. Same layout as the texttables tables with a header delimiter.'''
+
+    def __init__(self, file, widths, header_delimiter='-', cell_delimiter=' ', corner='+'):
+        self.file = file
+        self.line = cell_delimiter.join('{!s:<%d.%d}' % (width, width) for width in widths).format
+        self.rule = corner.join(header_delimiter * width for width in widths)
+
+    def writeheader(self, headers):
+        self.file.write(self.line(*headers) + '\n' + self.rule + '\n')
+
+    def writerow(self, row):
+        self.file.write(self.line(*row) + '\n')
@@ -1,18 +1,43 @@
-import sys, pathlib, json
-from pprint import pprint
-from stravatools.scraper import StravaScraper, NotLogged
+import pathlib, json, collections, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from stravatools.store import ActivityStore, Query
+from stravatools import export
+from stravatools.outbox import KudoOutbox
+from stravatools._intern.cache import ResponseCache
+from stravatools._intern.metrics import Metrics
+from stravatools._intern.records import raw_value, to_unit
 from stravatools._intern.tools import *
 from stravatools._intern.units import *
 
-__this_module__ = sys.modules[__name__]
 
 class Client(object):
 
-    def __init__(self, config_dirname=None, cert=None, debug=0):
+    def __init__(self, config_dirname=None, cert=None, debug=0, transport=None, cache_ttl=0, cache_size=50*1024*1024, stream=False, metrics_path=None, persist=False):
         self.config = Config(config_dirname)
-        self.scraper = StravaScraper(self.config.basepath, self.config['owner_id'], cert, debug)
-        self.activities = []
+        self.metrics = Metrics(metrics_path)
+        self.__scraper = None
+        self.__scraper_options = (cert, debug, transport, cache_ttl, cache_size, stream)
+        self.outbox = KudoOutbox(self.config.basepath / KudoOutbox.FILE)
+        self.activities = ActivityStore()
         self.selected_activities = []
+        self.__columns = (0, None)
+        self.database = None
+        if persist:
+            from stravatools.database import ActivityDatabase
+            self.database = ActivityDatabase(self.config.basepath / ActivityDatabase.FILE)
+            self.activities.add(map(lambda a: Activity(self, a), self.database.records()))
+
+    @property
+    def scraper(self):
+        '''The scraper, built with its HTTP session on first use'''
+        if self.__scraper is None:
+            from stravatools.scraper import StravaScraper
+            (cert, debug, transport, cache_ttl, cache_size, stream) = self.__scraper_options
+            cache = ResponseCache(self.config.basepath / 'cache', cache_ttl, cache_size) if cache_ttl > 0 else None
+            self.__scraper = StravaScraper(self.config.basepath, self.config['owner_id'], cert, debug, transport, cache, stream, self.metrics)
+            # Kudos can be resumed before any page is loaded
+            self.__scraper.csrf_token = self.config['csrf_token']
+        return self.__scraper
 
     def get_owner(self):
         if self.config['owner_id']:
@@ -35,30 +60,170 @@ class Client(object):
 
     def logout(self):
         self.scraper.logout()
+        self.config['csrf_token'] = None
 
     def load_activity_feed(self, next=False, num=20):
         if next: self.scraper.load_feed_next()
         else:    self.scraper.load_dashboard(min(max(1, num), 100))
         return self.store_activities()
 
-    def store_activities(self):
-        scraped_activities = list(map(lambda a: Activity(self, a), self.scraper.activities()))
-        new_activities = list(filter(lambda x: not any_match(self.activities, id_eq(x)), scraped_activities))
-        self.activities.extend(new_activities)
-        self.activities = sorted(self.activities, reverse=True, key=lambda x: x.datetime)
+    def load_all_activity_feed(self, num=100):
+        '''Loads the whole activity feed, storing each page on a worker
+        while the next one is being downloaded'''
+        if self.scraper.stream:
+            # A streamed page only knows its cursor once it has been parsed
+            (new, total) = self.load_activity_feed(num=num)
+            loaded = new
+            while new > 0:
+                (new, total) = self.load_activity_feed(next=True)
+                loaded = loaded + new
+            return (loaded, total)
+
+        # Set by the worker on a page adding nothing new, the feed is not
+        # requested any further
+        exhausted = threading.Event()
+        def store(document):
+            (new, total) = self.store_activities(document)
+            if new == 0: exhausted.set()
+            return new
+
+        stored = []
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for document in self.scraper.iter_feed(min(max(1, num), 100), exhausted):
+                # Storing stays at most one page behind the download
+                if len(stored) > 0: stored[-1].result()
+                if exhausted.is_set():
+                    break
+                stored.append(executor.submit(store, document))
+        return (sum(future.result() for future in stored), len(self.activities))
+
+    def sync(self, num=30):
+        '''Loads the activity feed until it reaches activities already stored'''
+        self.scraper.load_dashboard(min(max(1, num), 100))
+        (new_activities, scraped_activities) = self.__store()
+        loaded = len(new_activities)
+        while len(new_activities) > 0 and len(new_activities) == len(scraped_activities):
+            self.scraper.load_feed_next()
+            (new_activities, scraped_activities) = self.__store()
+            loaded = loaded + len(new_activities)
+        return (loaded, len(self.activities))
+
+    def store_activities(self, document=None):
+        (new_activities, scraped_activities) = self.__store(document)
         return (len(new_activities), len(self.activities))
 
-    def select_activities(self, predicate):
-        self.selected_activities = list(filter(predicate, self.activities))
+    def __store(self, document=None):
+        scraped_activities = list(map(lambda a: Activity(self, a), self.scraper.activities(document)))
+        metrics = (document or self.scraper.document).metrics
+        with metrics.measure('store') as fields:
+            new_activities = self.activities.add(scraped_activities)
+            if self.database: self.database.save(new_activities)
+            fields['activities'] = len(new_activities)
+        return (new_activities, scraped_activities)
+
+    def save_kudo(self, activity):
+        self.activities.update_kudo(activity)
+        if self.database: self.database.save_kudo(activity)
+
+    def send_kudos(self, activities, concurrency=1):
+        '''Sends kudos and yields (activity, sent) as soon as each one completes
+
+        Kudos are queued in the outbox first, those an interrupted run could
+        not send are left there for resume_kudos.'''
+        activities = collections.OrderedDict((activity.id, activity) for activity in activities)
+        self.outbox.add(activities.values())
+        # Saved now for a resume after a crash
+        self.config['csrf_token'] = self.scraper.csrf_token
+        self.config.save()
+        for (id, sent) in self.__deliver(list(activities.keys()), concurrency):
+            yield (activities[id], sent)
+
+    def resume_kudos(self, concurrency=1):
+        '''Sends the kudos left in the outbox, without loading any page, and
+        yields (intent, sent) where intent is a dict of id, athlete and title'''
+        intents = { intent['id']: intent for intent in self.outbox.pending() }
+        for (id, sent) in self.__deliver(list(intents.keys()), concurrency):
+            yield (intents[id], sent)
+
+    def __deliver(self, ids, concurrency):
+        def done(id, sent):
+            self.outbox.done(id, sent)
+            activity = self.activities.get(id)
+            if activity: activity.kudo_sent(sent)
+            return (id, sent)
+
+        if concurrency <= 1:
+            for id in ids:
+                yield done(id, self.scraper.send_kudo(id))
+            return
+
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        futures = { executor.submit(self.scraper.send_kudo, id): id for id in ids }
+        reported = set()
+        try:
+            for future in as_completed(futures):
+                reported.add(future)
+                yield done(futures[future], future.result())
+        finally:
+            # When the consumer stops early the kudos not started yet stay in
+            # the outbox, those already on their way are still recorded
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+            for future in futures:
+                if future not in reported and not future.cancelled():
+                    done(futures[future], future.result())
+
+    def columns(self, selected=False):
+        '''Columnar view of the stored (or selected) activities, see Columns'''
+        from stravatools._intern.columns import Columns
+        if selected:
+            return Columns(self.selected_activities)
+        (count, columns) = self.__columns
+        if columns is None:
+            columns = Columns()
+        # Only the activities stored since the last call are added
+        columns.extend(self.activities.added(count))
+        self.__columns = (len(self.activities), columns)
+        return columns
+
+    def export(self, path, format=None, selected=False, chunk_size=10000):
+        '''Writes the stored (or selected) activities to a csv, jsonl or
+        parquet file, see export.export'''
+        activities = self.selected_activities if selected else self.activities
+        return export.export(activities, pathlib.Path(path), format, chunk_size)
+
+    def select_activities(self, query):
+        '''Selects the activities matching a Query (answered from the store
+        indexes) or a predicate'''
+        if isinstance(query, Query):
+            self.selected_activities = self.activities.select(query)
+        else:
+            self.selected_activities = list(filter(query, self.activities))
 
     def close(self):
+        if self.__scraper:
+            self.config['csrf_token'] = self.__scraper.csrf_token
+            self.__scraper.save_state()
         self.config.save()
-        self.scraper.save_state()
+        self.metrics.close()
+        if self.database: self.database.close()
 
     def load_page(self, page):
         self.scraper.load_page(page)
         return self.store_activities()
 
+    def load_pages(self, patterns, workers=None):
+        '''Loads saved pages (files, directories or glob patterns) parsed
+        over a process pool and stores all their activities in one batch.
+        Returns the archive.Import with the number of new activities.'''
+        from stravatools._intern import archive
+        result = archive.parse_pages(archive.find_pages(patterns), workers)
+        new_activities = self.activities.add(Activity(self, record) for record in result.records)
+        if self.database: self.database.save(new_activities)
+        result.new = len(new_activities)
+        return result
+
 
 class Config(object):
     CONFIG_DIR = '/'.join((str(pathlib.Path.home()), '.strava-tools'))
@@ -94,6 +259,8 @@ class Config(object):
 
 
 class Model(object):
+    __slots__ = ()
+
     def __repr__(self):
         attrs = [
             '{0}={1}'.format(x, self.__getattribute__(x))
@@ -103,6 +270,11 @@ class Model(object):
         return '<{0} {1}>'.format(self.__class__.__name__, ' '.join(attrs))
 
 class Activity(Model):
+    # Distance, duration and elevation are stored as plain numbers (metres,
+    # seconds) and only wrapped in units when displayed
+    __slots__ = ('client', 'id', 'athlete', 'datetime', 'title', 'sport',
+                 'distance_m', 'duration_s', 'elevation_m', 'kudoed', 'kudos', 'dirty', 'display')
+
     def __init__(self, client, scraped):
         self.client = client
         self.id = scraped.get('id')
@@ -110,66 +282,98 @@ class Activity(Model):
         self.datetime = scraped.get('datetime')
         self.title = scraped.get('title')
         self.sport = Sport.of(scraped)
+        self.distance_m = raw_value(scraped.get('distance'))
+        self.duration_s = raw_value(scraped.get('duration'))
+        self.elevation_m = raw_value(scraped.get('elevation'))
         self.kudoed = scraped.get('kudoed')
         self.kudos = 0
         self.dirty = False
+        # Display strings, cached by the shell until the kudo state changes
+        self.display = None
+
+    @property
+    def distance(self):
+        return to_unit(Distance, self.distance_m)
+
+    @property
+    def duration(self):
+        return to_unit(Duration, self.duration_s)
+
+    @property
+    def elevation(self):
+        return to_unit(Elevation, self.elevation_m)
+
+    def velocity(self):
+        return self.sport.velocity(self.duration, self.distance)
 
     def send_kudo(self):
-        sent = self.client.scraper.send_kudo(self.id)
+        return self.kudo_sent(self.client.scraper.send_kudo(self.id))
+
+    def kudo_sent(self, sent):
         if sent:
             self.kudoed = True
             self.dirty = True
+            self.display = None
+            self.client.save_kudo(self)
         return sent
 
 class Athlete(Model):
+    __slots__ = ('id', 'name')
+    # Athletes are shared by all their activities
+    interned = {}
+
     def __init__(self, id, name):
         self.id = id
         self.name = name
 
     @classmethod
     def of(cls, data):
-        return cls(data.get('athlete_id'), data.get('athlete_name'))
+        # Athletes are the same by id, by name only when the id is unknown
+        (id, name) = (data.get('athlete_id'), data.get('athlete_name'))
+        key = (id, None) if id is not None else (None, name)
+        athlete = cls.interned.get(key)
+        if athlete is None:
+            athlete = cls.interned.setdefault(key, cls(id, name))
+        return athlete
 
 class Sport(Model):
-    def __init__(self, scraped):
-        self.name = scraped.get('kind')
-        self.duration = scraped.get('duration')
-        self.distance = scraped.get('distance')
-        self.elevation = scraped.get('elevation')
+    __slots__ = ('name',)
+    # One instance per kind of sport, shared by all activities
+    interned = {}
+    # Unit its paces are displayed in
+    pace = 'minkm'
 
-    def velocity(self):
+    def __init__(self, name):
+        self.name = name
+
+    def velocity(self, duration, distance):
         return UNIT_EMPTY
 
+    @staticmethod
     def of(scraped):
         kind = scraped.get('kind')
-        if hasattr(__this_module__, kind):
-            return getattr(__this_module__, kind)(scraped)
-        return Sport(scraped)
+        sport = Sport.interned.get(kind)
+        if sport is None:
+            sport = Sport.interned.setdefault(kind, SPORT_KINDS.get(kind, Sport)(kind))
+        return sport
 
 class Run(Sport):
-    def velocity(self):
-        return Pace(self.duration, self.distance, 'minkm')
-
-class Bike(Sport):
-    def velocity(self):
-        return Speed(self.duration, self.distance, 'kmh')
-
-class Swim(Sport):
-    def velocity(self):
-        return Pace(self.duration, self.distance, 'min100m')
-
-
-
-
-
-
-
-
-
-
+    __slots__ = ()
 
+    def velocity(self, duration, distance):
+        return Pace(duration, distance, self.pace)
 
+class Bike(Sport):
+    __slots__ = ()
 
+    def velocity(self, duration, distance):
+        return Speed(duration, distance, 'kmh')
 
+class Swim(Sport):
+    __slots__ = ()
+    pace = 'min100m'
 
+    def velocity(self, duration, distance):
+        return Pace(duration, distance, self.pace)
 
+SPORT_KINDS = { cls.__name__: cls for cls in (Run, Bike, Swim) }
@@ -0,0 +1,68 @@
+import sqlite3, threading
+
+from stravatools._intern import records
+from stravatools._intern.records import FIELDS, activity_row, format_datetime, parse_datetime
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS activities (
+    id TEXT PRIMARY KEY,
+    athlete_id TEXT,
+    athlete_name TEXT,
+    datetime TEXT,
+    title TEXT,
+    kind TEXT,
+    distance REAL,
+    duration REAL,
+    elevation REAL,
+    kudoed INTEGER
+)'''
+
+# Rows of records.py, with the datetime as text and kudoed as 0 / 1
+def to_row(activity):
+    row = activity_row(activity)
+    return row[:3] + (format_datetime(row[3]),) + row[4:-1] + (1 if row[-1] else 0,)
+
+def to_record(row):
+    record = records.to_record(row)
+    record['datetime'] = parse_datetime(record['datetime'])
+    record['kudoed'] = bool(record['kudoed'])
+    return record
+
+class ActivityDatabase(object):
+    '''Activities persisted in a SQLite file
+
+    Activities are written in one transaction per batch. The connection is
+    shared by the threads of the client (feed worker, kudo pool).'''
+
+    FILE = 'activities.db'
+
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(str(path), check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute(SCHEMA)
+
+    def save(self, activities):
+        rows = list(map(to_row, activities))
+        if len(rows) == 0:
+            return
+        with self.lock, self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO activities (%s) VALUES (%s)' % (', '.join(FIELDS), ', '.join('?' * len(FIELDS))),
+                rows)
+
+    def save_kudo(self, activity):
+        with self.lock, self.connection:
+            self.connection.execute('UPDATE activities SET kudoed = ? WHERE id = ?', (1 if activity.kudoed else 0, activity.id))
+
+    def records(self):
+        '''Yields the stored activities as scraped records'''
+        with self.lock:
+            rows = self.connection.execute('SELECT %s FROM activities' % ', '.join(FIELDS)).fetchall()
+        return map(to_record, rows)
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
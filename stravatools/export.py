@@ -0,0 +1,76 @@
+import csv, itertools, json
+
+from stravatools._intern.records import activity_row
+
+FORMATS = ('csv', 'jsonl', 'parquet')
+SUFFIXES = {'.csv': 'csv', '.jsonl': 'jsonl', '.json': 'jsonl', '.parquet': 'parquet'}
+
+# Distances and elevations are in metres, durations in seconds
+FIELDS = ('id', 'athlete_id', 'athlete_name', 'datetime', 'title', 'sport', 'distance', 'duration', 'elevation', 'kudoed')
+
+def to_row(activity):
+    row = activity_row(activity)
+    return row[:3] + (row[3].isoformat() if row[3] else None,) + row[4:-1] + (bool(row[-1]),)
+
+def chunks(activities, size):
+    '''Rows of the activities, size at a time'''
+    activities = iter(activities)
+    while True:
+        rows = list(map(to_row, itertools.islice(activities, size)))
+        if len(rows) == 0:
+            return
+        yield rows
+
+def format_of(path):
+    format = SUFFIXES.get(path.suffix.lower())
+    if format is None:
+        raise ValueError('Unknown export format of %s, use one of %s' % (path, ', '.join(FORMATS)))
+    return format
+
+def write_csv(activities, path, chunk_size):
+    with path.open('w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(FIELDS)
+        for rows in chunks(activities, chunk_size):
+            writer.writerows(rows)
+
+def write_jsonl(activities, path, chunk_size):
+    with path.open('w', encoding='utf-8') as file:
+        for rows in chunks(activities, chunk_size):
+            file.write(''.join(json.dumps(dict(zip(FIELDS, row)), ensure_ascii=False) + '\n' for row in rows))
+
+def write_parquet(activities, path, chunk_size):
+    try:
+        import pyarrow, pyarrow.parquet
+    except ImportError:
+        raise ImportError('pyarrow is required for the parquet export')
+    schema = pyarrow.schema([
+        ('id', pyarrow.string()),
+        ('athlete_id', pyarrow.string()),
+        ('athlete_name', pyarrow.string()),
+        ('datetime', pyarrow.string()),
+        ('title', pyarrow.string()),
+        ('sport', pyarrow.string()),
+        ('distance', pyarrow.float64()),
+        ('duration', pyarrow.float64()),
+        ('elevation', pyarrow.float64()),
+        ('kudoed', pyarrow.bool_()),
+    ])
+    with pyarrow.parquet.ParquetWriter(str(path), schema) as writer:
+        for rows in chunks(activities, chunk_size):
+            columns = [ pyarrow.array(column, type=field.type) for column, field in zip(zip(*rows), schema) ]
+            writer.write_table(pyarrow.Table.from_arrays(columns, schema=schema))
+
+WRITERS = {'csv': write_csv, 'jsonl': write_jsonl, 'parquet': write_parquet}
+
+def export(activities, path, format=None, chunk_size=10000):
+    '''Writes the activities to path, chunk_size rows at a time, and returns
+    how many were written. The format is guessed from the path suffix when
+    not given.'''
+    count = [0]
+    def counted(activities):
+        for activity in activities:
+            count[0] += 1
+            yield activity
+    WRITERS[format or format_of(path)](counted(activities), path, chunk_size)
+    return count[0]
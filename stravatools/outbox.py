@@ -0,0 +1,79 @@
+import collections, json, os
+
+class KudoOutbox(object):
+    '''Append-only journal of the kudos to send, safe against crashes
+
+    An intent line is written (and synced to disk) for every activity before
+    its kudo is sent and a result line once it is sent, so the kudos of an
+    interrupted run can be resumed from the journal alone. Activities are
+    only queued once. The journal is rewritten with the pending intents
+    only when it is opened and whenever nothing is left pending.'''
+
+    FILE = 'kudos.jsonl'
+
+    def __init__(self, path):
+        self.path = path
+        self.__pending = collections.OrderedDict()
+        if self.__load() > len(self.__pending):
+            self.compact()
+
+    def __load(self):
+        '''Replays the journal and returns its number of lines'''
+        lines = 0
+        try:
+            with self.path.open(encoding='utf-8') as file:
+                for line in file:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # Last line cut by a crash
+                        continue
+                    if entry['op'] == 'intent':
+                        self.__pending[entry['id']] = entry
+                    elif entry['op'] == 'sent':
+                        self.__pending.pop(entry['id'], None)
+        except OSError:
+            pass
+        return lines
+
+    def __append(self, entries):
+        with self.path.open('a', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries))
+            file.flush()
+            os.fsync(file.fileno())
+
+    def add(self, activities):
+        '''Queues the activities not pending yet, returns the queued ones'''
+        queued = [ activity for activity in activities if activity.id not in self.__pending ]
+        entries = [ {'op': 'intent', 'id': activity.id, 'athlete': activity.athlete.name, 'title': activity.title}
+            for activity in queued ]
+        if len(entries) > 0:
+            self.__append(entries)
+            for entry in entries:
+                self.__pending[entry['id']] = entry
+        return queued
+
+    def done(self, id, sent):
+        '''Records the result of a kudo, a failed one stays pending'''
+        if not sent:
+            self.__append([{'op': 'failed', 'id': id}])
+            return
+        self.__append([{'op': 'sent', 'id': id}])
+        self.__pending.pop(id, None)
+        if len(self.__pending) == 0:
+            self.compact()
+
+    def pending(self):
+        '''Intents not sent yet, in the order they were queued: dicts of id,
+        athlete and title'''
+        return list(self.__pending.values())
+
+    def compact(self):
+        '''Rewrites the journal with the pending intents only'''
+        temporary = self.path.with_name(self.path.name + '.tmp')
+        with temporary.open('w', encoding='utf-8') as file:
+            file.write(''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in self.__pending.values()))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(str(temporary), str(self.path))
@@ -1,15 +1,22 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
-import requests, http, time, traceback, sys, re, os
+import http.cookiejar, time, traceback, sys, json
+import lxml.html
 
-from bs4 import BeautifulSoup
 from datetime import datetime
 from pprint import pprint
 
 from stravatools import __version__
 from stravatools._intern.tools import *
+from stravatools._intern.document import Document, EMPTY_DOCUMENT, scan_csrf_token
+from stravatools._intern.stream import StreamDocument
+from stravatools._intern.transport import Transport
+from stravatools._intern.throttle import THROTTLED_STATUSES, retry_after
+from stravatools._intern.extract import CardExtractor, xpath, has_class, text
+from stravatools._intern.metrics import Metrics, NO_METRICS
 from stravatools._intern.units import *
+from stravatools._intern.stats import to_distance, to_elevation, to_duration, to_sport
 
 class StravaScraper(object):
     USER_AGENT = "stravatools/%s" % __version__
@@ -25,60 +32,100 @@ class StravaScraper(object):
     URL_DASHBOARD_FEED = "%s/dashboard/feed?feed_type=following&athlete_id=%%s&before=%%s&cursor=%%s" % BASE_URL
     URL_SEND_KUDO = "%s/feed/activity/%%s/kudo" % BASE_URL
 
-    soup = None
+    document = EMPTY_DOCUMENT
     response = None
     csrf_token = None
     feed_cursor = None
     feed_before = None
 
-    def __init__(self, cookie_dir, owner_id=None, cert=None, debug=0):
+    def __init__(self, cookie_dir, owner_id=None, cert=None, debug=0, transport=None, cache=None, stream=False, metrics=None):
         self.cookies_path = cookie_dir / 'cookies.txt'
         self.owner = (owner_id, None)
         self.cert = cert
         self.debug = debug
+        self.transport = transport or Transport()
+        self.cache = cache
+        self.stream = stream
+        self.metrics = metrics or Metrics()
         self.session = self.__create_session(owner_id == None)
         self.get = lambda url, logged=True, allow_redirects=True: self.__store_response(self.__get(url, logged, allow_redirects))
         self.post = lambda url, data=None, logged=True, allow_redirects=True: self.__store_response(self.__post(url, data, logged, allow_redirects))
 
     def __create_session(self, fresh):
-        session = requests.Session()
         cookies = http.cookiejar.MozillaCookieJar(str(self.cookies_path))
         if not fresh:
             try: cookies.load()
             except OSError: pass
-        session.cookies = cookies
-        return session
+        return self.transport.session(cookies, StravaScraper.BASE_HEADERS, self.cert)
 
-    def __get(self, url, logged=True, allow_redirects=True):
-        self.__debug_request(url)
-        response = self.session.get(url, headers=StravaScraper.BASE_HEADERS, verify=self.cert, allow_redirects=allow_redirects)
+    def __get(self, url, logged=True, allow_redirects=True, headers={}, stream=False, metrics=None):
+        send = lambda: self.session.get(url, headers=headers, allow_redirects=allow_redirects, stream=stream)
+        response = self.__send('GET', url, send, stream, metrics)
         self.__debug_response(response)
-        self.__check_response(response, logged)
+        # A streamed body is checked chunk by chunk as it is parsed
+        self.__check_response(response, logged and not stream)
         return response
 
     def __post(self, url, data=None, logged=True, allow_redirects=True):
-        self.__debug_request(url)
-        csrf_header = {}
-        if self.csrf_token: csrf_header[StravaScraper.CSRF_H] = self.csrf_token
+        self.__debug_request('POST', url)
+        headers = {}
+        if self.csrf_token: headers[StravaScraper.CSRF_H] = self.csrf_token
 
-        headers = {**StravaScraper.BASE_HEADERS, **csrf_header}
         if data:
-            response = self.session.post(url, data=data, headers=headers, verify=self.cert, allow_redirects=allow_redirects)
+            send = lambda: self.session.post(url, data=data, headers=headers, allow_redirects=allow_redirects)
         else:
-            response = self.session.post(url, headers=headers, verify=self.cert, allow_redirects=allow_redirects)
+            send = lambda: self.session.post(url, headers=headers, allow_redirects=allow_redirects)
+        response = self.__send('POST', url, send)
         self.__debug_response(response)
         self.__check_response(response, logged)
         return response
 
+    def __send(self, method, url, send, stream=False, metrics=None):
+        '''Sends a request once the throttle allows it, and again (up to the
+        transport retries) while the server answers it is overloaded
+
+        metrics are the ones of the request when they were opened before,
+        by a cache lookup.'''
+        self.__debug_request(method, url)
+        metrics = metrics or self.metrics.request(method, url)
+        metrics.sent()
+        throttle = self.transport.throttle
+        attempt = 0
+        while True:
+            if throttle:
+                with metrics.measure('throttle'):
+                    throttle.acquire()
+            with metrics.measure('fetch') as fields:
+                start = time.perf_counter()
+                response = send()
+                fields['status'] = response.status_code
+                if not stream: fields['bytes'] = len(response.content)
+                latency = time.perf_counter() - start
+            if throttle is None:
+                break
+            if response.status_code not in THROTTLED_STATUSES:
+                throttle.succeeded(latency)
+                break
+            delay = retry_after(response.headers.get('Retry-After'))
+            throttle.throttled(delay)
+            if attempt >= self.transport.retries:
+                break
+            if self.debug > 0:
+                print('<<< Status %d, retrying after %s' % (response.status_code, '%.1fs' % delay if delay else 'backoff'))
+            response.close()
+            attempt += 1
+        response.metrics = metrics
+        return response
+
     def __check_response(self, response, logged=False):
         response.raise_for_status()
         if logged and "class='logged-out" in response.text:
             raise NotLogged()
         return response
 
-    def __debug_request(self, url):
+    def __debug_request(self, method, url):
         if self.debug > 0:
-            print('>>> GET %s' % url)
+            print('>>> %s %s' % (method, url))
 
     def __debug_response(self, response):
         if self.debug > 0:
@@ -97,12 +144,53 @@ class StravaScraper(object):
 
     def __store_response(self, response):
         self.response = response
-        self.soup = BeautifulSoup(response.text, 'lxml')
-        meta = first(self.soup.select('meta[name="csrf-token"]'))
-        if meta:
-            self.csrf_token = meta.get('content')
+        self.document = Document.of(response, response.metrics)
+        token = self.document.csrf_token()
+        if token:
+            self.csrf_token = token
         return response
 
+    def __store_cached(self, entry, metrics):
+        self.response = None
+        self.document = Document(records=entry['records'], metrics=metrics)
+
+    def __inspect_chunk(self, chunk):
+        if LOGGED_OUT in chunk:
+            raise NotLogged()
+        if not self.csrf_token:
+            token = scan_csrf_token(chunk.decode('utf-8', 'ignore'))
+            if token: self.csrf_token = token
+
+    def __store_stream(self, response):
+        self.response = None
+        self.document = StreamDocument(response, self.__inspect_chunk, self.__store_cursor, metrics=response.metrics)
+
+    def __load_feed(self, url):
+        if not self.cache:
+            if self.stream:
+                self.__store_stream(self.__get(url, stream=True))
+            else:
+                self.get(url)
+            return
+
+        metrics = self.metrics.request('GET', url)
+        with metrics.measure('cache') as fields:
+            entry = self.cache.get(url)
+            fields['hit'] = entry is not None and self.cache.is_fresh(entry)
+        if fields['hit']:
+            self.__store_cached(entry, NO_METRICS)
+            return
+
+        response = self.__get(url, headers=self.cache.validators(entry) if entry else {}, metrics=metrics)
+        if entry and response.status_code == 304:
+            self.cache.revalidated(entry)
+            self.__store_cached(entry, response.metrics)
+            return
+
+        self.__store_response(response)
+        if response.status_code == 200 and self.document.text:
+            self.document.on_records = lambda records: self.cache.put(url, response, records)
+
     def __print_traceback(self):
         if self.debug > 0: traceback.print_exc(file=sys.stdout)
 
@@ -113,11 +201,8 @@ class StravaScraper(object):
         # If the client was logged, we safely logout first
         self.logout()
         self.get(StravaScraper.URL_LOGIN, logged=False)
-        soup = BeautifulSoup(self.response.content, 'lxml')
-        utf8 = soup.find_all('input',
-                             {'name': 'utf8'})[0].get('value').encode('utf-8')
-        token = soup.find_all('input',
-                              {'name': 'authenticity_token'})[0].get('value')
+        utf8 = self.document.xpath(LOGIN_UTF8)[0].get('value').encode('utf-8')
+        token = self.document.xpath(LOGIN_TOKEN)[0].get('value')
         login_data = {
             'utf8': utf8,
             'authenticity_token': token,
@@ -132,24 +217,28 @@ class StravaScraper(object):
         if self.response.status_code == 302 and self.response.headers['Location'] == StravaScraper.URL_LOGIN:
             raise WrongAuth()
 
-        self.load_dashboard()
+        # The profile is read from the live dashboard page, never from cache
+        self.get(StravaScraper.URL_DASHBOARD % (30+1))
+        self.__store_feed_params()
         try:
             assert("Log Out" in self.response.text)
-            profile = first(self.soup.select('div.athlete-profile'))
+            profile = first(self.document.xpath(PROFILE))
             self.owner = (
-                first(profile.select('a'), tag_get('href', lambda x:x.split('/')[-1])),
-                first(profile.select('div.athlete-name'), tag_string())
+                first(PROFILE_LINK(profile), tag_get('href', lambda x:x.split('/')[-1])),
+                first(PROFILE_NAME(profile), text)
             )
         except Exception as e:
             self.__print_traceback()
-            raise UnexpectedScrapped('Profile information cannot be retrieved', self.soup.text)
+            raise UnexpectedScrapped('Profile information cannot be retrieved', self.response.text)
 
     def logout(self):
         self.session.cookies.clear()
+        self.csrf_token = None
 
     def send_kudo(self, activity_id):
         try:
-            response = self.post(StravaScraper.URL_SEND_KUDO % activity_id)
+            # Kudo replies are not stored so that kudos can be sent concurrently
+            response = self.__post(StravaScraper.URL_SEND_KUDO % activity_id)
             return response.json()['success'] == 'true'
         except Exception as e:
             self.__print_traceback()
@@ -157,111 +246,72 @@ class StravaScraper(object):
 
     def load_page(self, path='page.html'):
         with open(path, 'r') as file:
-            self.soup = BeautifulSoup(file.read(), 'lxml')
+            self.document = Document(file.read())
 
     def load_dashboard(self, num=30):
-        self.get(StravaScraper.URL_DASHBOARD % (num+1))
+        self.__load_feed(StravaScraper.URL_DASHBOARD % (num+1))
         self.__store_feed_params()
 
     def load_feed_next(self):
-        self.get(StravaScraper.URL_DASHBOARD_FEED % (self.owner[0], self.feed_before, self.feed_cursor))
+        self.__load_feed(StravaScraper.URL_DASHBOARD_FEED % (self.owner[0], self.feed_before, self.feed_cursor))
         self.__store_feed_params()
 
+    def iter_feed(self, num=30, stop=None):
+        '''Yields the dashboard then every following feed page, until the
+        stop event is set
+
+        The cursor of each page is scanned from the raw text so the next page
+        is requested without waiting for the current one to be parsed.'''
+        self.__load_feed(StravaScraper.URL_DASHBOARD % (num+1))
+        while True:
+            document = self.document
+            cursor = document.feed_cursor()
+            if cursor is None:
+                return
+            yield document
+            if cursor == (self.feed_cursor, self.feed_before) or (stop and stop.is_set()):
+                return
+            (self.feed_cursor, self.feed_before) = cursor
+            self.__load_feed(StravaScraper.URL_DASHBOARD_FEED % (self.owner[0], self.feed_before, self.feed_cursor))
+
     def __store_feed_params(self):
-        remove_UTC = lambda x:x.replace(' UTC','')
-
-        cards = list(self.soup.select('div.activity.feed-entry.card'))
-        ranks = list(each(cards, tag_get('data-rank')))
-        updated = list(each(cards, tag_get('data-updated-at')))
-        datetimesUTC = list(each(self.soup.select('div.activity.feed-entry.card time time'), tag_get('datetime')))
-        datetimes = list(map(remove_UTC, datetimesUTC))
-        entries = list(zip(ranks, updated, datetimes))
-        if len(entries) > 0:
-            self.feed_cursor = sorted(entries, key=lambda data:data[0])[0][0]
-            self.feed_before = sorted(entries, key=lambda data:data[2])[0][1]
-
-    def activities(self):
-        for activity in self.soup.select('div.activity'):
-            try:
-                entry = {
-                    'athlete_name': first(activity.select('a.entry-owner'), tag_string()),
-                    'kind': first(activity.select('.entry-body .media .app-icon'), extract_sport()),
-                    'time': first(activity.select('time time'), tag_string()),
-                    'datetime': first(activity.select('time time'), tag_get('datetime', parse_datetime('%Y-%m-%d %H:%M:%S %Z'))),
-                    'title': first(activity.select('h3 a'), tag_string()),
-                    'id': first(activity.select('h3 a'), tag_get('href', lambda x: x.split('/')[-1])),
-                    'distance': find_stat(activity, r'\s*Distance\s*(.+)\s', to_distance),
-                    'duration': find_stat(activity, r'\s*Time\s*(.+)\s', to_duration),
-                    'elevation':find_stat(activity, r'\s*Elevation Gain\s*(.+)\s', to_elevation),
-                    'kudoed': first(activity.select('div.entry-footer div.media-actions button.js-add-kudo')) is None
-                }
-                yield entry
-            except Exception as e:
-                print(e)
-                self.__print_traceback()
-                if self.debug > 0:
-                    print("Unparsable %s" % activity)
+        # A streamed page stores its cursor once it has been read
+        self.__store_cursor(self.document.feed_cursor())
+
+    def __store_cursor(self, cursor):
+        if cursor:
+            (self.feed_cursor, self.feed_before) = cursor
+
+    def activities(self, document=None):
+        return (document or self.document).records(CARD_EXTRACTOR, self.__unparsable)
+
+    def __unparsable(self, error, card):
+        print(error)
+        self.__print_traceback()
+        if self.debug > 0:
+            print("Unparsable %s" % lxml.html.tostring(card, encoding='unicode'))
 
     # Utility functions
-def tag_string(mapper=identity):
-    return lambda tag: mapper(tag.string.replace('\n',''))
 def tag_get(attr, mapper=identity):
     return lambda tag: mapper(tag.get(attr))
 def parse_datetime(pattern):
     return lambda value: datetime.strptime(value, pattern)
-def has_class(tag, predicate):
-    return any_match(tag.get('class'), predicate)
-def extract_sport():
-    class_sports = {
-    'run':'Run',
-    'ride':'Bike',
-    'ski':'Ski',
-    'swim':'Swim',
-    '':'Sport' # Must defined at last position
-    }
-    return lambda tag: first([ v 
-        for k,v in class_sports.items()
-        if has_class(tag, lambda cls: contains(k, cls)) ])
-
-def to_distance(value):
-    m = re.search(r'\s*(.+)\s+(km|m)\s*', value)
-    if m:
-        # remove thousand separator
-        num = float(re.sub(r'[^\d\.]', '', m.group(1)))
-        if m.group(2) == 'km':
-            num = num * 1000
-        return Distance(num)
-    return UNIT_EMPTY
-
-def to_elevation(value):
-    m = re.search(r'\s*(.+)\s+(km|m)\s*', value)
-    if m:
-        # remove thousand separator
-        num = float(re.sub(r'[^\d\.]', '', m.group(1)))
-        if m.group(2) == 'km':
-            num = num * 1000
-        return Elevation(num)
-    return UNIT_EMPTY
-
-
-def to_duration(value):
-    units = {
-        'h': lambda s: int(s) * 60 * 60,
-        'm': lambda s: int(s) * 60,
-        's': lambda s: int(s),
-    }
-    m = re.search(r'\s*(\d+)([hms])\s+(\d+)([hms])\s*', value)
-    if m:
-        (s1, t1, s2, t2) = m.groups()
-        return Duration(units[t1](s1) + units[t2](s2))
-
-    return UNIT_EMPTY
-
-def find_stat(activity, pattern, formatter=identity):
-    for stat in activity.select('div.media-body ul.list-stats .stat'):
-        m = re.search(pattern, stat.text)
-        if m: return formatter(m.group(1))
-    return UNIT_EMPTY
+LOGGED_OUT = b"class='logged-out"
+
+LOGIN_UTF8 = xpath("//input[@name='utf8']")
+LOGIN_TOKEN = xpath("//input[@name='authenticity_token']")
+PROFILE = xpath("//div[%s]" % has_class('athlete-profile'))
+PROFILE_LINK = xpath(".//a")
+PROFILE_NAME = xpath(".//div[%s]" % has_class('athlete-name'))
+
+CARD_EXTRACTOR = CardExtractor({
+        'Distance': ('distance', to_distance),
+        'Time': ('duration', to_duration),
+        'Elevation Gain': ('elevation', to_elevation),
+    },
+    sport=to_sport,
+    parse_datetime=parse_datetime('%Y-%m-%d %H:%M:%S %Z'),
+    missing=UNIT_EMPTY)
 
 class NotLogged(Exception):
     pass
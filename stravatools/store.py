@@ -0,0 +1,202 @@
+import collections
+
+from stravatools._intern.tools import contains
+from stravatools._intern.chunks import SortedChunks
+from stravatools._intern.records import EPOCH
+from stravatools._intern.text import TextIndex, tokens, terms, matches
+
+
+def sort_key(activity):
+    # Newest first, activities without a date last
+    if activity.datetime is None:
+        return float('inf')
+    return -(activity.datetime - EPOCH).total_seconds()
+
+class Query(object):
+    '''Filters of ActivityStore.select, all optional and all required to match
+
+    athlete is matched against athlete names like the shell patterns (case
+    insensitive, a leading '-' negates it), sports is a list of sport names,
+    since / until a datetime range [since, until) and distance (m), duration
+    (s) and elevation (m) are (min, max) ranges, None for an open end.
+    text is searched in titles and athlete names: every word of it must
+    start a word of either, accents and case aside.'''
+
+    def __init__(self, athlete=None, sports=(), since=None, until=None, distance=None, duration=None, elevation=None, kudoed=None, text=None):
+        self.athlete = athlete
+        self.sports = set(sport.lower() for sport in sports)
+        self.since = since
+        self.until = until
+        self.distance = distance
+        self.duration = duration
+        self.elevation = elevation
+        self.kudoed = kudoed
+        self.terms = terms(text) if text else ()
+
+def in_range(value, bounds):
+    (low, high) = bounds
+    return value is not None and (low is None or value >= low) and (high is None or value <= high)
+
+class ActivityStore(object):
+    '''Activities kept newest first, indexed by id, athlete, sport and kudo
+
+    Activities are sorted in chunks (see chunks.py), so storing a page
+    costs the same whether it is newer than everything stored (sync), older
+    (load --all) or spread among the stored activities.
+
+    Every activity gets a sequence number in the order it was stored; the
+    athlete, sport and full-text indexes are lists of sequence numbers and
+    the kudo index holds one flag byte per sequence number.'''
+
+    def __init__(self, activities=[]):
+        self.__added = []
+        self.__activities = SortedChunks()
+        self.__ids = {}
+        self.__athletes = collections.defaultdict(list)
+        self.__sports = collections.defaultdict(list)
+        self.__kudoed = bytearray()
+        self.__text = TextIndex()
+        self.add(activities)
+
+    def add(self, activities):
+        '''Stores the activities that are not stored yet and returns them'''
+        new_activities = []
+        for activity in activities:
+            if activity.id not in self.__ids:
+                seq = len(self.__added)
+                self.__ids[activity.id] = seq
+                self.__added.append(activity)
+                self.__athletes[activity.athlete].append(seq)
+                self.__sports[activity.sport.name].append(seq)
+                self.__kudoed.append(1 if activity.kudoed else 0)
+                self.__text.add(seq, activity.title, activity.athlete.name)
+                new_activities.append(activity)
+        if len(new_activities) == 0:
+            return new_activities
+
+        page = sorted(new_activities, key=sort_key)
+        self.__activities.insert(list(map(sort_key, page)), page)
+        return new_activities
+
+    def update_kudo(self, activity):
+        '''Refreshes the kudo index after the kudo state of an activity changed'''
+        seq = self.__ids.get(activity.id)
+        if seq is not None:
+            self.__kudoed[seq] = 1 if activity.kudoed else 0
+
+    def select(self, query):
+        '''Activities matching the query, newest first
+
+        The most selective of the indexed filters (date range, sports,
+        athletes, kudo, text) provides the candidates, the other filters are only
+        checked against them.'''
+        athletes = self.__matching(self.__athletes, query.athlete, lambda athlete: contains(query.athlete, athlete.name))
+        sports = self.__matching(self.__sports, query.sports, lambda name: name.lower() in query.sports)
+        plans = []
+        if query.since is not None or query.until is not None:
+            (low, high) = self.__date_range(query.since, query.until)
+            plans.append((high - low, 'date', lambda: self.__activities[low:high]))
+        if sports is not None:
+            plans.append((sum(len(self.__sports[name]) for name in sports), 'sport', lambda: self.__postings(self.__sports, sports)))
+        if athletes is not None:
+            plans.append((sum(len(self.__athletes[athlete]) for athlete in athletes), 'athlete', lambda: self.__postings(self.__athletes, athletes)))
+        if query.kudoed is not None:
+            flag = 1 if query.kudoed else 0
+            count = self.__kudoed.count(1)
+            plans.append((count if flag else len(self.__kudoed) - count, 'kudo', lambda: self.__flagged(flag)))
+        if len(query.terms) > 0:
+            (count, seqs) = self.__text.candidates(query.terms)
+            plans.append((count, 'text', lambda: seqs))
+        if len(plans) == 0:
+            plans.append((len(self), 'all', lambda: self.__activities))
+
+        (count, source, candidates) = min(plans, key=lambda plan: plan[0])
+        checks = self.__checks(query, athletes, sports, skip=source)
+        if source == 'date' or source == 'all':
+            return [ activity for activity in candidates() if all(check(activity) for check in checks) ]
+
+        seqs = [ seq for seq in candidates() if all(check(self.__added[seq]) for check in checks) ]
+        # Same order as the store: by date then by sequence number
+        seqs.sort(key=lambda seq: (sort_key(self.__added[seq]), seq))
+        return [ self.__added[seq] for seq in seqs ]
+
+    def __matching(self, index, param, predicate):
+        if not param:
+            return None
+        return set(filter(predicate, index.keys()))
+
+    def __postings(self, index, keys):
+        for key in keys:
+            for seq in index[key]:
+                yield seq
+
+    def __flagged(self, flag):
+        (flags, byte) = (self.__kudoed, bytes((flag,)))
+        seq = flags.find(byte)
+        while seq >= 0:
+            yield seq
+            seq = flags.find(byte, seq + 1)
+
+    def __date_range(self, since, until):
+        # Keys are negative seconds: [since, until) is (-until, -since]
+        seconds = lambda date: (date - EPOCH).total_seconds()
+        low = self.__activities.bisect_right(-seconds(until)) if until is not None else 0
+        high = self.__activities.bisect_right(-seconds(since)) if since is not None else self.__activities.bisect_left(float('inf'))
+        return (low, max(low, high))
+
+    def __checks(self, query, athletes, sports, skip):
+        checks = []
+        if skip != 'date' and (query.since is not None or query.until is not None):
+            checks.append(lambda a: a.datetime is not None
+                and (query.since is None or a.datetime >= query.since)
+                and (query.until is None or a.datetime < query.until))
+        if skip != 'sport' and sports is not None:
+            checks.append(lambda a: a.sport.name in sports)
+        if skip != 'athlete' and athletes is not None:
+            checks.append(lambda a: a.athlete in athletes)
+        if skip != 'kudo' and query.kudoed is not None:
+            checks.append(lambda a: bool(a.kudoed) == query.kudoed)
+        if len(query.terms) > (1 if skip == 'text' else 0):
+            checks.append(lambda a: matches(tokens(a.title) + tokens(a.athlete.name), query.terms))
+        if query.distance is not None:
+            checks.append(lambda a: in_range(a.distance_m, query.distance))
+        if query.duration is not None:
+            checks.append(lambda a: in_range(a.duration_s, query.duration))
+        if query.elevation is not None:
+            checks.append(lambda a: in_range(a.elevation_m, query.elevation))
+        return checks
+
+    def added(self, since=0):
+        '''Activities in the order they were stored, from the since-th one'''
+        return self.__added[since:]
+
+    def get(self, id):
+        seq = self.__ids.get(id)
+        return self.__added[seq] if seq is not None else None
+
+    def of_athlete(self, athlete):
+        return [ self.__added[seq] for seq in self.__athletes.get(athlete, []) ]
+
+    def of_sport(self, name):
+        return [ self.__added[seq] for seq in self.__sports.get(name, []) ]
+
+    def athletes(self):
+        return list(self.__athletes.keys())
+
+    def sports(self):
+        return list(self.__sports.keys())
+
+    def __contains__(self, activity):
+        return activity.id in self.__ids
+
+    def __len__(self):
+        return len(self.__activities)
+
+    def __iter__(self):
+        return iter(self.__activities)
+
+    def __reversed__(self):
+        return reversed(self.__activities)
+
+    def __getitem__(self, index):
+        return self.__activities[index]
@@ -0,0 +1,37 @@
+import unittest
+
+from stravatools.client import Activity
+from stravatools.scraper import CARD_EXTRACTOR
+from stravatools.store import ActivityStore, Query
+from stravatools._intern.document import Document
+
+CARD = '''<div class="activity feed-entry card" data-rank="{id}" data-updated-at="1553724000">
+<div class="entry-head"><a class="entry-owner" href="/athletes/{athlete_id}">{name}</a>
+<time><time datetime="2019-03-27 22:00:00 UTC">Today</time></time></div>
+<h3><a href="/activities/{id}">Run {id}</a></h3></div>'''
+
+def page(*cards):
+    return '<html><body>%s</body></html>' % ''.join(CARD.format(id=id, athlete_id=athlete_id, name=name) for (id, athlete_id, name) in cards)
+
+class AthleteTest(unittest.TestCase):
+
+    def activities(self, *cards):
+        return [ Activity(None, record) for record in Document(page(*cards)).records(CARD_EXTRACTOR) ]
+
+    def test_athlete_id_is_read_from_the_owner_link(self):
+        (activity,) = self.activities(('7001', '9001', 'Ada Lovelace'))
+        self.assertEqual(activity.athlete.id, '9001')
+        self.assertEqual(activity.athlete.name, 'Ada Lovelace')
+
+    def test_athletes_sharing_a_name_stay_distinct(self):
+        (first, second, again) = self.activities(('7011', '9011', 'Jean Martin'), ('7012', '9012', 'Jean Martin'), ('7013', '9011', 'Jean Martin'))
+        self.assertIsNot(first.athlete, second.athlete)
+        self.assertIs(first.athlete, again.athlete)
+
+        store = ActivityStore([first, second, again])
+        self.assertEqual(len(store.athletes()), 2)
+        self.assertEqual(store.of_athlete(first.athlete), [first, again])
+        self.assertEqual(len(store.select(Query(athlete='jean martin'))), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import collections, json, re, shutil, socketserver, tempfile, threading, unittest
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from unittest import mock
+
+from stravatools.client import Client, Activity
+from stravatools.scraper import StravaScraper
+from stravatools._intern.transport import Transport
+
+KUDO_PATH = re.compile(r'^/feed/activity/(\d+)/kudo$')
+
+class KudoServer(socketserver.ThreadingMixIn, HTTPServer):
+    '''Local kudo endpoint counting the kudos received per activity'''
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), KudoHandler)
+        self.kudos = collections.Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server_address[1]
+
+class KudoHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        m = KUDO_PATH.match(self.path)
+        if m is None:
+            self.send_error(404)
+            return
+        with self.server.lock:
+            self.server.kudos[m.group(1)] += 1
+        body = json.dumps({'success': 'true'}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class SendKudosTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = KudoServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.config = tempfile.mkdtemp()
+        self.client = Client(self.config, transport=Transport())
+        patch = mock.patch.object(StravaScraper, 'URL_SEND_KUDO', self.server.url + '/feed/activity/%s/kudo')
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.config, ignore_errors=True)
+
+    def activities(self, count):
+        '''Stored activities without kudos, as the kudo command selects them'''
+        activities = [ Activity(self.client, {'id': str(1000 + i), 'athlete_name': 'Athlete %d' % i, 'title': 'Run %d' % i, 'kudoed': False})
+            for i in range(count) ]
+        self.client.activities.add(activities)
+        return activities
+
+    def test_concurrent_kudos_are_sent_once(self):
+        activities = self.activities(40)
+        # Every activity twice: kudos are only queued once
+        results = list(self.client.send_kudos(activities + activities, concurrency=8))
+
+        self.assertEqual(sorted(activity.id for (activity, sent) in results), sorted(activity.id for activity in activities))
+        self.assertTrue(all(sent for (activity, sent) in results))
+        self.assertEqual(self.server.kudos, collections.Counter(activity.id for activity in activities))
+        for activity in activities:
+            self.assertTrue(activity.kudoed)
+            self.assertTrue(activity.dirty)
+        self.assertEqual(self.client.outbox.pending(), [])
+
+    def test_sequential_kudos(self):
+        activities = self.activities(5)
+        results = list(self.client.send_kudos(activities, concurrency=1))
+
+        self.assertEqual([ activity.id for (activity, sent) in results ], [ activity.id for activity in activities ])
+        self.assertEqual(self.server.kudos, collections.Counter(activity.id for activity in activities))
+
+    def test_stopped_batch_leaves_unsent_kudos_pending(self):
+        activities = self.activities(40)
+        kudos = self.client.send_kudos(activities, concurrency=2)
+        next(kudos)
+        kudos.close()
+
+        sent = set(self.server.kudos)
+        self.assertLess(len(sent), len(activities))
+        self.assertEqual(sorted(intent['id'] for intent in self.client.outbox.pending()),
+            sorted(activity.id for activity in activities if activity.id not in sent))
+
+if __name__ == '__main__':
+    unittest.main()
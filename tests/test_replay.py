@@ -0,0 +1,45 @@
+import importlib.util, os, pathlib, shutil, tempfile, unittest
+
+import requests
+
+from stravatools.client import Client
+from stravatools.scraper import StravaScraper
+from stravatools._intern.capture import Capture
+from stravatools._intern.transport import Transport
+
+# benchmarks/ is not a package: the synthetic feed is loaded from its file
+FEED_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'feed.py')
+spec = importlib.util.spec_from_file_location('feed', FEED_PATH)
+feed = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(feed)
+
+class ReplayTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.capture = pathlib.Path(self.directory) / 'capture'
+        page = next(feed.Feed(20).pages(20, 20)).encode('utf-8')
+        request = requests.Request('GET', StravaScraper.URL_DASHBOARD % 21).prepare()
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'text/html; charset=utf-8'
+        response._content = page
+        Capture(self.capture).record(request, response)
+
+    def load(self, stream):
+        client = Client(os.path.join(self.directory, 'stream' if stream else 'page'), transport=Transport(replay=self.capture), stream=stream)
+        try:
+            client.load_activity_feed()
+            return sorted(activity.id for activity in client.activities)
+        finally:
+            client.close()
+
+    def test_replayed_page_is_streamed(self):
+        loaded = self.load(False)
+        self.assertEqual(len(loaded), 20)
+        self.assertEqual(self.load(True), loaded)
+
+if __name__ == '__main__':
+    unittest.main()
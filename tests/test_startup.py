@@ -0,0 +1,30 @@
+import importlib.util, os, statistics, tempfile, unittest
+
+# benchmarks/ is not a package: the startup benchmark is loaded from its file
+STARTUP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks', 'startup.py')
+spec = importlib.util.spec_from_file_location('startup', STARTUP_PATH)
+startup = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(startup)
+
+BUDGET_MS = 150
+
+def roots(modules):
+    return set(module.split('.')[0] for module in modules)
+
+class StartupTest(unittest.TestCase):
+
+    def test_shell_defers_heavy_imports(self):
+        times = startup.importtime('import %s' % startup.MODULE)
+        self.assertEqual(roots(times) & set(startup.DEFERRED), set())
+
+    def test_client_defers_heavy_imports(self):
+        with tempfile.TemporaryDirectory() as config:
+            times = startup.importtime(startup.CLIENT, config)
+        self.assertEqual(roots(times) & set(startup.DEFERRED), set())
+
+    def test_shell_import_time_budget(self):
+        median = statistics.median(startup.importtime('import %s' % startup.MODULE)[startup.MODULE] for _ in range(3)) / 1000.0
+        self.assertLess(median, BUDGET_MS)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import bisect, datetime, random, unittest
+
+from stravatools.client import Activity
+from stravatools.store import ActivityStore, Query
+from stravatools._intern.chunks import SortedChunks
+
+START = datetime.datetime(2019, 3, 27, 22, 0, 0)
+
+class SortedChunksTest(unittest.TestCase):
+
+    def test_same_order_as_a_sorted_list(self):
+        r = random.Random(0)
+        for size in (1, 2, 8):
+            chunks = SortedChunks(size)
+            (keys, items) = ([], [])
+            for page in range(40):
+                page_keys = sorted(r.randint(0, 50) for _ in range(r.randint(0, 12)))
+                page_items = [ (page, i) for i in range(len(page_keys)) ]
+                for (key, item) in zip(page_keys, page_items):
+                    i = bisect.bisect_right(keys, key)
+                    keys.insert(i, key)
+                    items.insert(i, item)
+                chunks.insert(page_keys, page_items)
+
+            self.assertEqual(list(chunks), items)
+            self.assertEqual(list(reversed(chunks)), items[::-1])
+            self.assertEqual(chunks[5:len(items) - 5], items[5:-5])
+            self.assertEqual([ chunks[i] for i in range(-len(items), len(items)) ], items + items)
+            for key in range(-1, 52):
+                self.assertEqual(chunks.bisect_left(key), bisect.bisect_left(keys, key))
+                self.assertEqual(chunks.bisect_right(key), bisect.bisect_right(keys, key))
+
+class ActivityStoreTest(unittest.TestCase):
+
+    def activities(self, first, count):
+        '''count activities an hour apart, newest first, from first hours after START'''
+        return [ Activity(None, {'id': str(first + i), 'datetime': START + datetime.timedelta(hours=first + count - i)})
+            for i in range(count) ]
+
+    def test_newer_and_older_pages_are_kept_newest_first(self):
+        store = ActivityStore()
+        pages = [ self.activities(start, 30) for start in (1000, 2000, 0, 3000, 500) ]
+        for page in pages:
+            store.add(page)
+
+        expected = sorted((activity for page in pages for activity in page), key=lambda activity: activity.datetime, reverse=True)
+        self.assertEqual(list(store), expected)
+        self.assertEqual(list(reversed(store)), expected[::-1])
+        self.assertEqual(store.select(Query(since=START + datetime.timedelta(hours=2000), until=START + datetime.timedelta(hours=2011))),
+            [ activity for activity in expected if 2000 <= (activity.datetime - START).total_seconds() / 3600 < 2011 ])
+
+if __name__ == '__main__':
+    unittest.main()